@@ -1 +1,27 @@
-from ibis_mssql.api import connect, compile  # noqa
+"""Ibis backend for MSSQL.
+
+The backend, and ibis, SQLAlchemy and pyodbc with it, is imported when
+:func:`connect` or :func:`compile` is first called, so importing the package
+is cheap.
+"""
+
+
+def connect(*args, **kwargs):
+    """Create an Ibis client connected to a MSSQL database.
+
+    See :func:`ibis_mssql.api.connect` for the parameters. No connection is
+    opened until the client first runs a query or reflects a table.
+    """
+    from ibis_mssql.api import connect
+
+    return connect(*args, **kwargs)
+
+
+def compile(expr, params=None):
+    """Compile an ibis expression to the MSSQL target.
+
+    See :func:`ibis_mssql.api.compile`.
+    """
+    from ibis_mssql.api import compile
+
+    return compile(expr, params=params)
@@ -1,10 +1,12 @@
-from ibis.sql.alchemy import to_sqlalchemy
+from ibis.client import find_backends
 
+from ibis_mssql.cache import ResultCache
 from ibis_mssql.client import MSSQLClient
 from ibis_mssql.compiler import (  # noqa: F401, E501
     compiles,
     dialect,
     rewrites,
+    to_sqlalchemy,
 )
 
 
@@ -44,6 +46,10 @@ def compile(expr, params=None):
     SELECT t0.double_col + ? AS tmp
     FROM functional_alltypes AS t0
     """
+    backends = list(find_backends(expr))
+    if len(backends) == 1 and isinstance(backends[0], MSSQLClient):
+        # reuse the client's cache of compiled queries
+        return backends[0].compile(expr, params=params)
     return to_sqlalchemy(expr, dialect.make_context(params=params))
 
 
@@ -56,6 +62,17 @@ def connect(
     driver='pyodbc',
     odbc_driver='ODBC Driver 17 for SQL Server',
     url=None,
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=False,
+    pool_recycle=-1,
+    pool_reset_on_return='rollback',
+    columnar=False,
+    query_cache_size=128,
+    metadata_ttl=None,
+    server_stats=False,
+    result_cache=None,
+    result_cache_check_interval=0,
 ):
     """Create an Ibis client connected to a MSSQL database.
 
@@ -71,11 +88,53 @@ def connect(
         arguments are ignored.
     driver : string, default 'pyodbc'
     odbc_driver : string, default 'ODBC Driver 17 for SQL Server'
+    pool_size : int, default 5
+        Number of connections kept open in the connection pool.
+    max_overflow : int, default 10
+        Number of connections allowed beyond `pool_size` under load.
+    pool_pre_ping : boolean, default False
+        Test connections for liveness each time they are checked out.
+    pool_recycle : int, default -1
+        Replace connections older than this many seconds. ``-1`` disables
+        recycling.
+    pool_reset_on_return : {'rollback', 'commit', None}, default 'rollback'
+        How connections are reset when they are returned to the pool.
+    columnar : boolean, default False
+        Fetch results into typed NumPy arrays column by column. Integer and
+        boolean columns with nulls are returned as pandas masked arrays.
+    query_cache_size : int, default 128
+        Number of compiled queries kept by the client. ``0`` disables the
+        cache.
+    metadata_ttl : float, optional
+        Seconds after which reflected tables and table listings are read
+        from the server again. If ``None``, they are kept until
+        :meth:`MSSQLClient.invalidate` is called.
+    server_stats : boolean, default False
+        Run queries reported to query listeners with
+        ``SET STATISTICS IO, TIME ON`` and include the logical reads and CPU
+        time in their measurements.
+    result_cache : str or ibis_mssql.cache.ResultCache, optional
+        Store the results of queries executed with ``cache=True`` in this
+        directory, as Arrow files reused until one of the tables they read
+        is modified. Detecting changes requires the ``VIEW SERVER STATE``
+        permission. Results of tables not modified since the server started
+        aren't cached.
+    result_cache_check_interval : float, default 0
+        Seconds during which table versions looked up for the
+        `result_cache` are trusted, so cache hits within the interval don't
+        query the server. Ignored if `result_cache` is a
+        :class:`~ibis_mssql.cache.ResultCache`, which has its own
+        ``check_interval``.
 
     Returns
     -------
     MSSQLClient
 
+    Notes
+    -----
+    Clients with the same connection URL and pool settings share a single
+    engine, so connections are reused across clients in the same process.
+
     Examples
     --------
     >>> import os
@@ -113,6 +172,10 @@ def connect(
         year : int32
         month : int32
     """
+    if isinstance(result_cache, str):
+        result_cache = ResultCache(
+            result_cache, check_interval=result_cache_check_interval
+        )
     return MSSQLClient(
         host=host,
         user=user,
@@ -122,4 +185,14 @@ def connect(
         url=url,
         driver=driver,
         odbc_driver=odbc_driver,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        pool_reset_on_return=pool_reset_on_return,
+        columnar=columnar,
+        query_cache_size=query_cache_size,
+        metadata_ttl=metadata_ttl,
+        server_stats=server_stats,
+        result_cache=result_cache,
     )
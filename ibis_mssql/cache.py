@@ -0,0 +1,286 @@
+"""Result caching for the MSSQL client."""
+
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+_VERSIONS_KEY = b'ibis_mssql.table_versions'
+
+
+def result_key(*parts):
+    """Return a file-name safe key identifying a query result.
+
+    Parameters
+    ----------
+    parts : str
+        E.g. the connection URL, the compiled SQL and its bound parameters.
+
+    Returns
+    -------
+    key : str
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Query results stored as Arrow IPC files in a directory.
+
+    Every file records the versions of the tables read by its query. An
+    entry is only returned while the current versions match, so results are
+    recomputed once a referenced table has been modified.
+
+    Parameters
+    ----------
+    path : str
+        Directory holding the cached results. It is created if it does not
+        exist and may be shared by several processes.
+    check_interval : float, default 0
+        Seconds during which the versions of a table looked up on the server
+        are trusted. Within the interval cache hits don't touch the network;
+        with ``0`` every hit checks the tables it reads.
+    """
+
+    def __init__(self, path, check_interval=0):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.arrow')
+
+    def table_versions(self, names, load):
+        """Return the current version of each table in `names`.
+
+        Parameters
+        ----------
+        names : list of str
+        load : callable
+            Called with the names whose versions are unknown or older than
+            `check_interval`, returns a dict mapping them to their versions.
+
+        Returns
+        -------
+        versions : dict
+        """
+        now = time.monotonic()
+        versions = {}
+        with self._lock:
+            for name in names:
+                entry = self._versions.get(name)
+                if entry is not None and now - entry[0] < self.check_interval:
+                    versions[name] = entry[1]
+        missing = [name for name in names if name not in versions]
+        if missing:
+            loaded = load(missing)
+            with self._lock:
+                for name, version in loaded.items():
+                    self._versions[name] = now, version
+            versions.update(loaded)
+        return versions
+
+    def get(self, key, versions):
+        """Return the cached result for `key`, or ``None``.
+
+        The file is memory-mapped, so only the columns materialized by pandas
+        are read from disk. Entries recorded with other table `versions` are
+        removed.
+        """
+        import pyarrow as pa
+
+        path = self._file(key)
+        try:
+            source = pa.memory_map(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        with source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            recorded = json.loads(metadata.get(_VERSIONS_KEY, b'null'))
+            table = reader.read_all() if recorded == versions else None
+
+        if table is None:
+            self.misses += 1
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            return None
+        self.hits += 1
+        return table.to_pandas()
+
+    def put(self, key, df, versions):
+        """Store the DataFrame `df` computed from tables at `versions`."""
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_VERSIONS_KEY] = json.dumps(versions).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        # write next to the final file and rename it, so concurrent readers
+        # never see a partially written entry
+        path = self._file(key)
+        tmp = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        try:
+            with pa.OSFile(tmp, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+
+    def clear(self):
+        """Remove all cached results."""
+        for name in os.listdir(self.path):
+            if name.endswith('.arrow'):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.path, name))
+        with self._lock:
+            self._versions.clear()
+            self.hits = self.misses = 0
+
+
+class ResultCacheInfo(
+    collections.namedtuple(
+        'ResultCacheInfo',
+        ['hits', 'misses', 'entries', 'maxbytes', 'currbytes'],
+    )
+):
+    """Hit and memory statistics of a :class:`MemoryResultCache`."""
+
+    __slots__ = ()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def _freeze(df):
+    """Make the arrays holding the values of `df` read-only, in place."""
+    manager = getattr(df, '_mgr', None) or df._data
+    for block in manager.blocks:
+        values = block.values
+        # extension arrays, e.g. masked integers, keep numpy arrays inside
+        arrays = [values] + [
+            getattr(values, name, None) for name in ('_data', '_mask')
+        ]
+        for array in arrays:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+    return df
+
+
+class MemoryResultCache:
+    """Query results kept in memory, evicting least recently used entries.
+
+    Cached DataFrames are made read-only and every lookup returns a shallow
+    copy of them, so hits share the cached arrays instead of copying them.
+    Columns can still be added to or dropped from a returned frame, but
+    assigning to its values raises ``ValueError``; call ``copy()`` first to
+    modify them.
+
+    Parameters
+    ----------
+    maxbytes : int, default 256 MiB
+        Total in-memory size of the cached results. Results larger than this
+        are not cached.
+    ttl : float, optional
+        Default number of seconds entries are returned for. If ``None``,
+        they are kept until evicted.
+    """
+
+    def __init__(self, maxbytes=256 * 2 ** 20, ttl=None):
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.currbytes = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        _, nbytes, _ = self._data.pop(key)
+        self.currbytes -= nbytes
+
+    def get(self, key):
+        """Return the cached result for `key`, or ``None``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None:
+                if entry[0] < time.monotonic():
+                    self._pop(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return entry[2].copy(deep=False)
+
+    def put(self, key, df, ttl=None):
+        """Cache the DataFrame `df` for `ttl` seconds.
+
+        Parameters
+        ----------
+        key : str
+        df : pandas.DataFrame
+            Made read-only in place.
+        ttl : float, optional
+            Overrides the cache's default `ttl`.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            A read-only view of `df`.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        df = _freeze(df)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if nbytes <= self.maxbytes:
+                self._data[key] = expires, nbytes, df
+                self.currbytes += nbytes
+                while self.currbytes > self.maxbytes:
+                    self._pop(next(iter(self._data)))
+        return df.copy(deep=False)
+
+    def clear(self):
+        """Remove all cached results."""
+        with self._lock:
+            self._data.clear()
+            self.currbytes = 0
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        with self._lock:
+            return ResultCacheInfo(
+                self.hits,
+                self.misses,
+                len(self._data),
+                self.maxbytes,
+                self.currbytes,
+            )
+
+
+#: The in-memory result cache shared by all clients of the process.
+memory_cache = MemoryResultCache()
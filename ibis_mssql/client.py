@@ -1,18 +1,54 @@
+import asyncio
+import collections
+import concurrent.futures
 import contextlib
-import datetime
+import copy
+import functools
 import getpass
+import hashlib
+import operator
+import threading
+import time
+import uuid
+import weakref
 
+import numpy as np
+import pandas as pd
 import sqlalchemy as sa
+import sqlalchemy.dialects.mssql as mssql
 from sqlalchemy.dialects.mssql.pyodbc import MSDialect_pyodbc
+from sqlalchemy.sql import util as sql_util, visitors
 
+import ibis
+import ibis.common.exceptions as com
 import ibis.expr.datatypes as dt
 import ibis.expr.operations as ops
+import ibis.expr.rules as rlz
 import ibis.expr.schema as sch
+import ibis.expr.types as ir
 import ibis.sql.alchemy as alch
+import ibis.util as util
+from ibis.client import find_backends
+from ibis.expr.signature import Argument as Arg
 
-from ibis_mssql.compiler import MSSQLDialect
+from ibis_mssql.cache import memory_cache, result_key
+from ibis_mssql.compiler import (
+    TABLE_HINTS_KEY,
+    CastLikeColumn,
+    MSSQLDialect,
+    add_hints,
+    build_ast,
+    param_key,
+)
+from ibis_mssql.metrics import QueryStats, parse_statistics
 
-import pyodbc  # NOQA fail early if the driver is missing
+
+# SQL Server caps a single TDS batch at 65,536 network packets; keep each
+# ``executemany`` batch well below that for the default 4 KB packet size
+_MAX_BATCH_BYTES = 64 * 1024 * 1024
+_MAX_BATCH_ROWS = 100000
+# assumed width of ``(n)varchar(max)`` values when sizing batches
+_MAX_VARCHAR_WIDTH = 4000
 
 
 @dt.dtype.register(MSDialect_pyodbc, sa.dialects.mssql.UNIQUEIDENTIFIER)
@@ -25,8 +61,733 @@ def sa_boolean(_, satype, nullable=True):
     return dt.Boolean(nullable=nullable)
 
 
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _engine_key(url, pool_options):
+    """Return a hashable key identifying `url` and its pool settings.
+
+    Host and driver names are case-insensitive and query options may be given
+    in any order, so they are normalized before building the key.
+    """
+    return (
+        url.drivername.lower(),
+        (url.host or '').lower(),
+        url.port,
+        url.username,
+        url.password,
+        url.database,
+        tuple(sorted((k.lower(), v) for k, v in url.query.items())),
+        tuple(sorted(pool_options.items())),
+    )
+
+
+def _get_engine(url, **pool_options):
+    """Return the process-wide engine for `url`, creating it on first use.
+
+    Clients connecting with the same URL and pool settings share one engine
+    and therefore one connection pool.
+    """
+    key = _engine_key(url, pool_options)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = sa.create_engine(url, **pool_options)
+    return engine
+
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'maxsize', 'currsize']
+)
+
+
+class _LRUCache:
+    """A thread-safe mapping that evicts its least recently used entries."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, len(self._data)
+            )
+
+
+class _TTLCache:
+    """A thread-safe mapping whose entries expire after `ttl` seconds.
+
+    A `ttl` of ``None`` keeps entries until they are removed explicitly.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return None
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = expires, value
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# the type of the object and when it was last modified since the server
+# started, NULL if it hasn't been
+_TABLE_VERSION_QUERY = """\
+SELECT o.type, MAX(u.last_user_update)
+FROM sys.objects AS o
+LEFT JOIN sys.dm_db_index_usage_stats AS u
+    ON u.database_id = DB_ID() AND u.object_id = o.object_id
+WHERE o.object_id = OBJECT_ID(?)
+GROUP BY o.type"""
+
+
+def _quote_table_name(table):
+    parts = [table.schema, table.name] if table.schema else [table.name]
+    return '.'.join('[{}]'.format(part.replace(']', ']]')) for part in parts)
+
+
+def _reads_raw_sql(statement):
+    """Whether `statement` selects from SQL text, e.g. of :meth:`sql`."""
+    for element in visitors.iterate(statement, {}):
+        if isinstance(element, sa.sql.expression.TextAsFrom):
+            return True
+        if isinstance(element, sa.sql.Select) and any(
+            isinstance(source, sa.sql.expression.TextClause)
+            for source in element.froms
+        ):
+            return True
+    return False
+
+
+UpsertResult = collections.namedtuple('UpsertResult', ['inserted', 'updated'])
+
+
+def _merge_statement(target, source, columns, keys):
+    """Return the batch merging `source` into `target`, counting its rows.
+
+    All identifiers must already be quoted.
+    """
+    values = [column for column in columns if column not in keys]
+    on = ' AND '.join('t.{0} = s.{0}'.format(key) for key in keys)
+    if values:
+        update = 'WHEN MATCHED THEN UPDATE SET {}\n'.format(
+            ', '.join('t.{0} = s.{0}'.format(column) for column in values)
+        )
+    else:
+        update = ''
+    return (
+        'SET NOCOUNT ON;\n'
+        'DECLARE @actions TABLE (action NVARCHAR(10));\n'
+        'MERGE INTO {target} WITH (HOLDLOCK) AS t\n'
+        'USING {source} AS s ON {on}\n'
+        '{update}'
+        'WHEN NOT MATCHED BY TARGET THEN INSERT ({columns}) '
+        'VALUES ({source_columns})\n'
+        'OUTPUT $action INTO @actions;\n'
+        "SELECT SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END) FROM @actions;\n"
+        'SET NOCOUNT OFF;'
+    ).format(
+        target=target,
+        source=source,
+        on=on,
+        update=update,
+        columns=', '.join(columns),
+        source_columns=', '.join('s.' + column for column in columns),
+    )
+
+
+_WARM_METADATA_QUERY = """\
+SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH,
+       NUMERIC_PRECISION, NUMERIC_SCALE, COLLATION_NAME, IS_NULLABLE
+FROM INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = COALESCE(?, SCHEMA_NAME())
+ORDER BY TABLE_NAME, ORDINAL_POSITION"""
+
+
+# the types the MSSQL dialect's column reflection passes a length
+_SIZED_TYPES = (
+    mssql.VARCHAR,
+    mssql.CHAR,
+    mssql.NVARCHAR,
+    mssql.NCHAR,
+    mssql.TEXT,
+    mssql.NTEXT,
+    mssql.BINARY,
+    mssql.VARBINARY,
+    sa.types.LargeBinary,
+)
+
+
+def _reflected_type(dialect, data_type, charlen, precision, scale, collation):
+    """Build a SQLAlchemy type from an ``INFORMATION_SCHEMA`` column row.
+
+    This follows the rules of the MSSQL dialect's own column reflection.
+    """
+    coltype = dialect.ischema_names.get(data_type)
+    if coltype is None:
+        return sa.types.NULLTYPE
+
+    kwargs = {}
+    # an explicit list: e.g. TIMESTAMP (rowversion) is a binary type that
+    # takes no length
+    if coltype in _SIZED_TYPES:
+        kwargs['length'] = None if charlen == -1 else charlen
+        if collation:
+            kwargs['collation'] = collation
+    elif issubclass(coltype, sa.types.Numeric):
+        kwargs['precision'] = precision
+        if not issubclass(coltype, sa.types.Float):
+            kwargs['scale'] = scale
+    return coltype(**kwargs)
+
+
+_sql_type_names = {
+    'bit': dt.boolean,
+    'tinyint': dt.int16,
+    'smallint': dt.int16,
+    'int': dt.int32,
+    'bigint': dt.int64,
+    'real': dt.float32,
+    'float': dt.float64,
+    'money': dt.Decimal(19, 4),
+    'smallmoney': dt.Decimal(10, 4),
+    'char': dt.string,
+    'varchar': dt.string,
+    'text': dt.string,
+    'nchar': dt.string,
+    'nvarchar': dt.string,
+    'ntext': dt.string,
+    'sysname': dt.string,
+    'xml': dt.string,
+    'uniqueidentifier': dt.string,
+    'binary': dt.binary,
+    'varbinary': dt.binary,
+    'image': dt.binary,
+    'timestamp': dt.binary,
+    'rowversion': dt.binary,
+    'geography': dt.binary,
+    'geometry': dt.binary,
+    'hierarchyid': dt.binary,
+    'date': dt.date,
+    'time': dt.time,
+    'smalldatetime': dt.timestamp,
+    'datetime': dt.timestamp,
+    'datetime2': dt.timestamp,
+    'datetimeoffset': dt.Timestamp(timezone='UTC'),
+}
+
+
+def _type_from_sql_name(type_name, precision, scale, nullable=True):
+    """Return the ibis type of a SQL Server type name.
+
+    `type_name` is a ``system_type_name`` as reported by
+    ``sp_describe_first_result_set``, e.g. ``'varchar(50)'``.
+    """
+    base = type_name.split('(', 1)[0].strip().lower()
+    if base in ('decimal', 'numeric'):
+        return dt.Decimal(precision, scale, nullable=nullable)
+    try:
+        dtype = _sql_type_names[base]
+    except KeyError:
+        raise com.UnsupportedBackendType(type_name)
+    return dtype(nullable=nullable)
+
+
+def _to_mssql_type(dtype):
+    """Return the SQLAlchemy type used to create a column of `dtype`."""
+    if isinstance(dtype, dt.Timestamp):
+        return mssql.DATETIME2()
+    elif isinstance(dtype, dt.String):
+        return mssql.NVARCHAR()
+    elif isinstance(dtype, dt.Boolean):
+        return mssql.BIT()
+    return alch._to_sqla_type(dtype)
+
+
+def _input_size(satype):
+    """Return the pyodbc ``setinputsizes`` entry for a reflected column.
+
+    ``None`` leaves the parameter to pyodbc's own type detection.
+    """
+    import pyodbc
+
+    if isinstance(satype, sa.types.Unicode):
+        return pyodbc.SQL_WVARCHAR, satype.length or 0, 0
+    elif isinstance(satype, sa.types.String):
+        return pyodbc.SQL_VARCHAR, satype.length or 0, 0
+    elif isinstance(satype, (mssql.BIT, sa.types.Boolean)):
+        return pyodbc.SQL_BIT, 1, 0
+    elif isinstance(satype, mssql.TINYINT):
+        return pyodbc.SQL_TINYINT, 3, 0
+    elif isinstance(satype, sa.types.SmallInteger):
+        return pyodbc.SQL_SMALLINT, 5, 0
+    elif isinstance(satype, sa.types.BigInteger):
+        return pyodbc.SQL_BIGINT, 19, 0
+    elif isinstance(satype, sa.types.Integer):
+        return pyodbc.SQL_INTEGER, 10, 0
+    elif isinstance(satype, sa.types.REAL):
+        return pyodbc.SQL_REAL, 24, 0
+    elif isinstance(satype, sa.types.Float):
+        return pyodbc.SQL_DOUBLE, 53, 0
+    elif isinstance(satype, sa.types.Numeric):
+        return pyodbc.SQL_DECIMAL, satype.precision or 18, satype.scale or 0
+    elif isinstance(satype, mssql.DATETIME2):
+        return pyodbc.SQL_TYPE_TIMESTAMP, 27, 7
+    elif isinstance(satype, sa.types.DateTime):
+        return pyodbc.SQL_TYPE_TIMESTAMP, 23, 3
+    elif isinstance(satype, sa.types.Date):
+        return pyodbc.SQL_TYPE_DATE, 10, 0
+    return None
+
+
+def _row_width(input_sizes):
+    """Estimate the number of bytes one row of parameters occupies."""
+    import pyodbc
+
+    width = 0
+    for size in input_sizes:
+        if size is None:
+            width += 8
+        elif size[0] in (pyodbc.SQL_WVARCHAR, pyodbc.SQL_VARCHAR):
+            chars = size[1] or _MAX_VARCHAR_WIDTH
+            width += 2 * chars if size[0] == pyodbc.SQL_WVARCHAR else chars
+        else:
+            width += max(size[1], 8)
+    return max(width, 1)
+
+
+def _bind_value(value):
+    """Convert a NumPy scalar, which pyodbc can't bind, to a Python one."""
+    if isinstance(value, np.generic) and value.dtype.kind not in 'mM':
+        return value.item()
+    return value
+
+
+def _to_parameter_rows(df):
+    """Convert `df` into a list of row tuples that pyodbc can bind.
+
+    Columns are converted one at a time so every value is a Python object of
+    the column's type and missing values are ``None``.
+    """
+    columns = []
+    for _, series in df.items():
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = series.dt.to_pydatetime()
+        else:
+            values = series.astype(object).values
+        values[series.isnull().values] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _column_array(values, dtype):
+    """Convert one column of fetched values into a typed array and mask.
+
+    Numeric, boolean and timestamp columns are stored in arrays of the NumPy
+    type of `dtype` with nulls recorded in the mask; anything else is kept as
+    an object array.
+    """
+    mask = np.array([value is None for value in values], dtype=bool)
+    np_dtype = dtype.to_pandas()
+    if not isinstance(np_dtype, np.dtype) or np_dtype.kind not in 'biufM':
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array, mask
+    if np_dtype.kind != 'M' and mask.any():
+        values = [0 if value is None else value for value in values]
+    return np.array(values, dtype=np_dtype), mask
+
+
+def _fetch_arrays(proxy, schema, chunksize):
+    """Yield a list of ``(array, mask)`` pairs for each chunk of rows."""
+    while True:
+        rows = proxy.fetchmany(chunksize)
+        if not rows:
+            break
+        yield [
+            _column_array(values, dtype)
+            for values, dtype in zip(zip(*rows), schema.types)
+        ]
+
+
+def _concat_arrays(chunks, schema):
+    """Concatenate the chunks produced by :func:`_fetch_arrays`."""
+    chunks = list(chunks)
+    if not chunks:
+        return [_column_array((), dtype) for dtype in schema.types]
+    return [
+        (
+            np.concatenate([chunk[i][0] for chunk in chunks]),
+            np.concatenate([chunk[i][1] for chunk in chunks]),
+        )
+        for i in range(len(schema))
+    ]
+
+
+def _arrays_to_frame(arrays, schema):
+    """Build a DataFrame from ``(array, mask)`` pairs.
+
+    Integer and boolean columns containing nulls become pandas masked arrays
+    rather than float or object columns.
+    """
+    data = {}
+    for name, (array, mask) in zip(schema.names, arrays):
+        if mask.any():
+            if array.dtype.kind in 'iu':
+                array = pd.arrays.IntegerArray(array, mask)
+            elif array.dtype.kind == 'b':
+                array = pd.arrays.BooleanArray(array, mask)
+            elif array.dtype.kind == 'f':
+                array[mask] = np.nan
+        data[name] = array
+    return pd.DataFrame(data, columns=schema.names)
+
+
+def _to_arrow_type(dtype):
+    """Return the Arrow type holding values of `dtype`."""
+    import pyarrow as pa
+
+    if isinstance(dtype, dt.Timestamp):
+        return pa.timestamp('ns', tz=dtype.timezone)
+    elif isinstance(dtype, dt.Decimal):
+        return pa.decimal128(dtype.precision or 38, dtype.scale or 0)
+    elif isinstance(dtype, dt.Time):
+        return pa.time64('us')
+    elif isinstance(dtype, dt.Date):
+        return pa.date32()
+    elif isinstance(dtype, dt.String):
+        return pa.string()
+    elif isinstance(dtype, dt.Binary):
+        return pa.binary()
+    return pa.from_numpy_dtype(dtype.to_pandas())
+
+
+def _to_arrow_schema(schema):
+    """Return the Arrow schema of record batches holding rows of `schema`."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field(name, _to_arrow_type(dtype), nullable=dtype.nullable)
+            for name, dtype in zip(schema.names, schema.types)
+        ]
+    )
+
+
+def _arrays_to_record_batch(arrays, arrow_schema):
+    """Build a ``pyarrow.RecordBatch`` from ``(array, mask)`` pairs."""
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(array, mask=mask, type=field.type)
+            for (array, mask), field in zip(arrays, arrow_schema)
+        ],
+        schema=arrow_schema,
+    )
+
+
+class _StatementHandle:
+    """Track the DBAPI cursor of a running statement so it can be cancelled.
+
+    Register :meth:`record` as a ``before_cursor_execute`` listener on the
+    connection executing the statement.
+    """
+
+    def __init__(self):
+        self.cursor = None
+
+    def record(self, conn, cursor, statement, parameters, context, many):
+        self.cursor = cursor
+
+    def cancel(self):
+        cursor = self.cursor
+        if cursor is not None:
+            cursor.cancel()
+
+
+class _MaterializedTables:
+    """Global temporary tables and the connection owning them.
+
+    Kept apart from the client, so a finalizer of the client can drop the
+    tables without holding a reference to it.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.tables = []
+        self.lock = threading.Lock()
+
+    def drop(self):
+        with self.lock:
+            if self.connection is not None:
+                for table in self.tables:
+                    table.drop(bind=self.connection)
+                self.connection.close()
+            self.connection = None
+            self.tables = []
+
+
 class MSSQLTable(alch.AlchemyTable):
-    pass
+    hints = Arg(rlz.noop, default=())
+
+    def __init__(self, table, source, schema=None, hints=()):
+        schema = sch.infer(table, schema=schema)
+        ops.DatabaseTable.__init__(
+            self, table.name, schema, source, tuple(hints)
+        )
+        self.sqla_table = table
+
+
+class MSSQLQuery(alch.AlchemyQuery):
+    def __init__(self, client, sql, hints=None, **kwargs):
+        super().__init__(client, sql, **kwargs)
+        self.compiled_sql = add_hints(self.compiled_sql, hints)
+        self.statement = self.compiled_sql
+        self.bind_params = {}
+        self.compile_time = 0.0
+        self.sql_hash = None
+
+    def _bound_statement(self):
+        """Return the statement with its parameter values bound."""
+        # binding values copies the statement, which drops its table hints
+        return add_hints(self.statement.params(self.bind_params))
+
+    def bind(self, compiled, bind_params):
+        """Return a copy of this query executing `compiled` with new values.
+
+        Parameters
+        ----------
+        compiled : sqlalchemy.engine.interfaces.Compiled
+            The compiled form of ``self.statement``.
+        bind_params : dict
+            Values for the named parameters of `compiled`.
+        """
+        query = copy.copy(self)
+        query.compiled_sql = compiled
+        query.bind_params = bind_params
+        return query
+
+    def execute(self, cache=False, **kwargs):
+        kwargs.setdefault('params', self.bind_params)
+        if cache:
+            result = self._execute_cached(cache, **kwargs)
+        else:
+            result = self._execute_frame(**kwargs)
+        return self._wrap_result(result)
+
+    def _execute_frame(self, **kwargs):
+        if self.client._query_listeners:
+            return self._execute_instrumented(**kwargs)
+        with self.client._execute(
+            self.compiled_sql, results=True, **kwargs
+        ) as cur:
+            return self._fetch(cur)
+
+    def _execute_cached(self, cache, **kwargs):
+        """Return the result from one of the client's result caches.
+
+        ``cache=True`` uses the on-disk cache if the client has one, whose
+        entries are only returned while their tables are unchanged. Otherwise,
+        and when `cache` is a number of seconds, the in-memory cache is used.
+        """
+        client = self.client
+        key = result_key(
+            repr(client.con.url),
+            str(self.compiled_sql),
+            repr(sorted(kwargs['params'].items())),
+        )
+        if cache is True and client.result_cache is not None:
+            return self._execute_persisted(key, **kwargs)
+
+        result = client.memory_cache.get(key)
+        if result is None:
+            ttl = None if cache is True else cache
+            result = client.memory_cache.put(
+                key, self._execute_frame(**kwargs), ttl=ttl
+            )
+        return result
+
+    def _execute_persisted(self, key, **kwargs):
+        """Return the result from the on-disk cache if it is current.
+
+        Queries reading views, temporary tables or raw SQL, whose changes
+        can't be detected, are always executed.
+        """
+        client = self.client
+        result_cache = client.result_cache
+        names = sorted(
+            {
+                _quote_table_name(table)
+                for table in sql_util.find_tables(self.statement)
+            }
+        )
+        if not names or _reads_raw_sql(self.statement):
+            return self._execute_frame(**kwargs)
+
+        versions = result_cache.table_versions(names, client._table_versions)
+        if any(versions[name] is None for name in names):
+            return self._execute_frame(**kwargs)
+
+        result = result_cache.get(key, versions)
+        if result is None:
+            result = self._execute_frame(**kwargs)
+            result_cache.put(key, result, versions)
+        return result
+
+    def _execute_instrumented(self, bind=None, **kwargs):
+        client = self.client
+        messages = None
+        with contextlib.ExitStack() as stack:
+            if client.server_stats:
+                if bind is None:
+                    bind = stack.enter_context(client.con.connect())
+                bind.execute('SET STATISTICS IO, TIME ON')
+                stack.callback(bind.execute, 'SET STATISTICS IO, TIME OFF')
+
+            start = time.perf_counter()
+            with client._execute(
+                self.compiled_sql, results=True, bind=bind, **kwargs
+            ) as cur:
+                executed = time.perf_counter()
+                if client.server_stats:
+                    result, messages = self._fetch_with_messages(cur)
+                else:
+                    result = self._fetch(cur)
+            fetched = time.perf_counter()
+
+        stats = QueryStats(
+            sql_hash=self.sql_hash,
+            sql=str(self.compiled_sql),
+            compile_time=self.compile_time,
+            execute_time=executed - start,
+            fetch_time=fetched - executed,
+            rows=len(result),
+            bytes=int(result.memory_usage(deep=True).sum()),
+            server_stats=(
+                parse_statistics(messages) if messages is not None else None
+            ),
+        )
+        for listener in list(client._query_listeners):
+            listener(stats)
+        return result
+
+    def _fetch_with_messages(self, cursor):
+        """Fetch all rows along with the informational messages of the query.
+
+        SQL Server sends the statistics of a statement after its last row,
+        so the DBAPI cursor is drained and advanced past the result set
+        before sqlalchemy closes it.
+        """
+        dbapi_cursor = cursor.proxy.cursor
+        names = cursor.proxy.keys()
+        messages = [text for _, text in getattr(dbapi_cursor, 'messages', [])]
+        rows = [tuple(row) for row in dbapi_cursor.fetchall()]
+        while True:
+            more = dbapi_cursor.nextset()
+            messages.extend(
+                text for _, text in getattr(dbapi_cursor, 'messages', [])
+            )
+            if not more:
+                break
+        df = pd.DataFrame.from_records(rows, columns=names, coerce_float=True)
+        return self.schema().apply_to(df), messages
+
+    def _fetch(self, cursor):
+        if not self.client.columnar:
+            return super()._fetch(cursor)
+        schema = self.schema()
+        chunks = _fetch_arrays(cursor.proxy, schema, self.client.arraysize)
+        return _arrays_to_frame(_concat_arrays(chunks, schema), schema)
+
+    def execute_iter(self, chunksize, **kwargs):
+        """Execute the query and yield results in chunks of `chunksize`.
+
+        Rows are read with ``fetchmany`` from pyodbc's forward-only cursor, so
+        at most one chunk of rows is held in memory at a time.
+        """
+        schema = self.schema()
+        kwargs.setdefault('params', self.bind_params)
+        with self.client._execute(
+            self.compiled_sql, results=True, **kwargs
+        ) as cur:
+            if self.client.columnar:
+                for arrays in _fetch_arrays(cur.proxy, schema, chunksize):
+                    df = _arrays_to_frame(arrays, schema)
+                    yield self._wrap_result(df)
+                return
+
+            names = cur.proxy.keys()
+            while True:
+                rows = cur.proxy.fetchmany(chunksize)
+                if not rows:
+                    break
+                df = pd.DataFrame.from_records(
+                    rows, columns=names, coerce_float=True
+                )
+                yield self._wrap_result(schema.apply_to(df))
+
+    def execute_batches(self, chunksize, **kwargs):
+        """Execute the query and yield ``pyarrow.RecordBatch`` objects."""
+        schema = self.schema()
+        arrow_schema = _to_arrow_schema(schema)
+        kwargs.setdefault('params', self.bind_params)
+        with self.client._execute(
+            self.compiled_sql, results=True, **kwargs
+        ) as cur:
+            for arrays in _fetch_arrays(cur.proxy, schema, chunksize):
+                yield _arrays_to_record_batch(arrays, arrow_schema)
 
 
 class MSSQLSchema(alch.AlchemyDatabaseSchema):
@@ -43,10 +804,29 @@ class MSSQLClient(alch.AlchemyClient):
     Attributes
     ----------
     con : sqlalchemy.engine.Engine
+    columnar : bool
+        Whether results are fetched into typed NumPy arrays column by column
+        instead of being built from row tuples.
+    arraysize : int
+        Number of rows fetched per round trip in columnar mode.
+    query_cache : _LRUCache
+        Compiled statements keyed by expression structure and limit.
+    metadata_cache : _TTLCache
+        Reflected tables and table and schema listings.
+    server_stats : bool
+        Whether queries reported to query listeners are run with
+        ``SET STATISTICS IO, TIME ON`` to capture logical reads and CPU time.
+    result_cache : ibis_mssql.cache.ResultCache or None
+        Results of queries executed with ``cache=True``, stored on disk.
+    memory_cache : ibis_mssql.cache.MemoryResultCache
+        Results of queries executed with ``cache=True`` kept in memory, by
+        default :data:`ibis_mssql.cache.memory_cache` shared by all clients.
     """
 
-    dialect = MSSQLDialect
+    arraysize = 10000
+
     database_class = MSSQLDatabase
+    query_class = MSSQLQuery
     table_class = MSSQLTable
 
     def __init__(
@@ -59,6 +839,16 @@ class MSSQLClient(alch.AlchemyClient):
         url=None,
         driver='pyodbc',
         odbc_driver='ODBC Driver 17 for SQL Server',
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=False,
+        pool_recycle=-1,
+        pool_reset_on_return='rollback',
+        columnar=False,
+        query_cache_size=128,
+        metadata_ttl=None,
+        server_stats=False,
+        result_cache=None,
     ):
         if url is None:
             if driver != 'pyodbc':
@@ -77,8 +867,70 @@ class MSSQLClient(alch.AlchemyClient):
             )
         else:
             url = sa.engine.url.make_url(url)
-        super().__init__(sa.create_engine(url))
+        self._pool_options = dict(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+            pool_reset_on_return=pool_reset_on_return,
+        )
+        # alch.AlchemyClient.__init__ creates an inspector, which connects to
+        # the server; the first reflection creates it instead
+        super(alch.AlchemyClient, self).__init__()
+        self.con = _get_engine(url, **self._pool_options)
+        self.meta = sa.MetaData(bind=self.con)
+        self._inspector = None
+        self._reflection_cache_is_dirty = False
+        self._schemas = {}
         self.database_name = url.database
+        self.columnar = columnar
+        self.query_cache = _LRUCache(query_cache_size)
+        self.metadata_cache = _TTLCache(metadata_ttl)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._materialized = _MaterializedTables()
+        # drop materialized tables of clients that are never closed
+        weakref.finalize(self, self._materialized.drop)
+        self._dialect = None
+        self._database_clients = {}
+        self.server_stats = server_stats
+        self._query_listeners = []
+        self.result_cache = result_cache
+        self.memory_cache = memory_cache
+
+    @property
+    def dialect(self):
+        """The ibis dialect targeting the version of the connected server.
+
+        The version is looked up when the client first compiles a query.
+        """
+        if self._dialect is None:
+            if self.con.dialect.server_version_info is None:
+                # the version is only known once a connection has been made
+                self.con.connect().close()
+            version = self.con.dialect.server_version_info
+            self._dialect = MSSQLDialect.for_server_version(version)
+        return self._dialect
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the resources held by this client.
+
+        Tables created by :meth:`materialize` are dropped, the connection
+        owning them is closed and the async thread pool is shut down. The
+        shared engine and its connection pool stay available to other
+        clients.
+        """
+        self._materialized.drop()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
 
     @contextlib.contextmanager
     def begin(self):
@@ -104,25 +956,263 @@ class MSSQLClient(alch.AlchemyClient):
 
         Notes
         -----
-        This creates a new connection if `name` is both not ``None`` and not
-        equal to the current database.
+        If `name` is both not ``None`` and not equal to the current database,
+        this returns a client for `name` that keeps this client's URL options
+        and pool settings. The client is created once and reused, and its
+        engine is shared with any other client connecting to the same URL.
         """
         if name == self.current_database or (
             name is None and name != self.current_database
         ):
             return self.database_class(self.current_database, self)
         else:
-            url = self.con.url
-            client_class = type(self)
-            new_client = client_class(
-                host=url.host,
-                user=url.username,
-                port=url.port,
-                password=url.password,
-                database=name,
-            )
+            new_client = self._database_clients.get(name)
+            if new_client is None:
+                url = copy.copy(self.con.url)
+                url.database = name
+                client_class = type(self)
+                new_client = client_class(
+                    url=url,
+                    columnar=self.columnar,
+                    query_cache_size=self.query_cache.maxsize,
+                    metadata_ttl=self.metadata_cache.ttl,
+                    server_stats=self.server_stats,
+                    result_cache=self.result_cache,
+                    **self._pool_options,
+                )
+                self._database_clients[name] = new_client
             return self.database_class(name, new_client)
 
+    def _columns_from_schema(self, name, schema):
+        return [
+            sa.Column(colname, _to_mssql_type(dtype), nullable=dtype.nullable)
+            for colname, dtype in zip(schema.names, schema.types)
+        ]
+
+    def load_data(
+        self,
+        table_name,
+        obj,
+        database=None,
+        schema=None,
+        if_exists='fail',
+        chunksize=None,
+    ):
+        """Insert the rows of a pandas DataFrame into a table.
+
+        Rows are sent with pyodbc's ``fast_executemany`` in batches whose
+        parameter types and sizes are taken from the reflected table, so the
+        driver can bind whole parameter arrays instead of one row at a time.
+
+        Parameters
+        ----------
+        table_name : string
+        obj : pandas.DataFrame
+        database : string, optional
+            The database holding the table. If ``None`` then the
+            ``current_database`` is used.
+        schema : string, optional
+            The schema holding the table.
+        if_exists : {'fail', 'replace', 'append'}, default 'fail'
+            What to do when the table already exists. If it does not exist
+            it is created from the schema of `obj`.
+        chunksize : int, optional
+            Number of rows sent per batch. By default this is derived from
+            the width of a row so that a batch stays well below SQL Server's
+            TDS batch size limit.
+        """
+        if if_exists not in ('fail', 'replace', 'append'):
+            raise ValueError(
+                "if_exists must be one of 'fail', 'replace' or 'append', "
+                'got {!r}'.format(if_exists)
+            )
+
+        if database is not None and database != self.current_database:
+            return self.database(name=database).client.load_data(
+                table_name,
+                obj,
+                schema=schema,
+                if_exists=if_exists,
+                chunksize=chunksize,
+            )
+
+        exists = table_name in self.inspector.get_table_names(schema=schema)
+        if exists and if_exists == 'fail':
+            raise com.IntegrityError(
+                'Table {!r} already exists'.format(table_name)
+            )
+
+        meta = sa.MetaData()
+        with self.begin() as bind:
+            if exists and if_exists == 'replace':
+                sa.Table(table_name, meta, schema=schema).drop(bind=bind)
+                meta.clear()
+                exists = False
+            if not exists:
+                ibis_schema = sch.infer(obj)
+                sa.Table(
+                    table_name,
+                    meta,
+                    *self._columns_from_schema(table_name, ibis_schema),
+                    schema=schema,
+                ).create(bind=bind)
+                meta.clear()
+
+            t = sa.Table(table_name, meta, schema=schema, autoload_with=bind)
+            self._insert_rows(bind, t, obj, chunksize=chunksize)
+
+        self._reflection_cache_is_dirty = True
+
+    def _insert_rows(self, bind, table, obj, chunksize=None):
+        """Insert the rows of the DataFrame `obj` into `table` on `bind`."""
+        columns = [table.columns[name] for name in obj.columns]
+        input_sizes = [_input_size(column.type) for column in columns]
+        if chunksize is None:
+            chunksize = max(
+                1,
+                min(
+                    _MAX_BATCH_ROWS,
+                    _MAX_BATCH_BYTES // _row_width(input_sizes),
+                ),
+            )
+
+        preparer = bind.dialect.identifier_preparer
+        statement = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            preparer.format_table(table),
+            ', '.join(preparer.format_column(c) for c in columns),
+            ', '.join('?' * len(columns)),
+        )
+
+        cursor = bind.connection.cursor()
+        try:
+            cursor.fast_executemany = True
+            cursor.setinputsizes(input_sizes)
+            for start in range(0, len(obj), chunksize):
+                chunk = obj.iloc[start : start + chunksize]
+                cursor.executemany(statement, _to_parameter_rows(chunk))
+        finally:
+            cursor.close()
+
+    def upsert(
+        self,
+        table_name,
+        obj,
+        keys,
+        database=None,
+        schema=None,
+        params=None,
+        chunksize=None,
+    ):
+        """Update or insert rows of a table from a DataFrame or expression.
+
+        The rows of `obj` are copied into a temporary staging table, then
+        merged into the table with a single ``MERGE`` statement: rows whose
+        `keys` match are updated, the others are inserted. Expressions on
+        this client's server are copied with ``INSERT ... SELECT`` without
+        leaving the server; DataFrames are bulk inserted like in
+        :meth:`load_data`. Everything runs in one transaction.
+
+        Parameters
+        ----------
+        table_name : string
+        obj : pandas.DataFrame or TableExpr
+            The rows to merge. Its columns must be columns of the table.
+        keys : list of string
+            The columns identifying a row. Every key must appear at most once
+            in `obj`.
+        database : string, optional
+            The database holding the table. If ``None`` then the
+            ``current_database`` is used.
+        schema : string, optional
+            The schema holding the table.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values, if `obj` is an expression.
+        chunksize : int, optional
+            Number of rows sent per batch when `obj` is a DataFrame.
+
+        Returns
+        -------
+        counts : UpsertResult
+            A namedtuple of the number of ``inserted`` and ``updated`` rows.
+        """
+        if database is not None and database != self.current_database:
+            return self.database(name=database).client.upsert(
+                table_name,
+                obj,
+                keys,
+                schema=schema,
+                params=params,
+                chunksize=chunksize,
+            )
+
+        keys = util.promote_list(keys)
+        if isinstance(obj, ir.TableExpr):
+            backends = list(find_backends(obj))
+            if len(backends) != 1 or backends[0].con is not self.con:
+                obj = obj.execute(params=params, limit=None)
+        columns = list(obj.columns)
+        missing_keys = set(keys).difference(columns)
+        if not keys or missing_keys:
+            raise ValueError(
+                'keys must be non-empty columns of obj, missing: {}'.format(
+                    ', '.join(sorted(missing_keys))
+                )
+            )
+
+        stage_name = '#ibis_upsert_{}'.format(uuid.uuid4().hex)
+        with self.begin() as bind:
+            target = sa.Table(
+                table_name, sa.MetaData(), schema=schema, autoload_with=bind
+            )
+            unknown = set(columns).difference(target.columns.keys())
+            if unknown:
+                raise ValueError(
+                    'Columns not in table {!r}: {}'.format(
+                        table_name, ', '.join(sorted(unknown))
+                    )
+                )
+
+            preparer = bind.dialect.identifier_preparer
+            stage = preparer.quote(stage_name)
+            if isinstance(obj, ir.TableExpr):
+                source_schema = obj.schema()
+                stage_table = sa.Table(
+                    stage_name,
+                    sa.MetaData(),
+                    *self._columns_from_schema(stage_name, source_schema),
+                )
+                stage_table.create(bind=bind)
+                query = self._get_query(obj, params=params, limit=None)
+                bind.execute(
+                    stage_table.insert().from_select(
+                        source_schema.names,
+                        query._bound_statement(),
+                    )
+                )
+            else:
+                stage_table = sa.Table(
+                    stage_name,
+                    sa.MetaData(),
+                    *[
+                        sa.Column(name, target.columns[name].type)
+                        for name in columns
+                    ],
+                )
+                stage_table.create(bind=bind)
+                self._insert_rows(bind, stage_table, obj, chunksize=chunksize)
+
+            counts = bind.execute(
+                _merge_statement(
+                    preparer.format_table(target),
+                    stage,
+                    [preparer.quote(name) for name in columns],
+                    [preparer.quote(name) for name in keys],
+                )
+            ).fetchone()
+            bind.execute('DROP TABLE {}'.format(stage))
+        return UpsertResult(*(count or 0 for count in counts))
+
     def schema(self, name):
         """Get a schema object from the current database for the schema named `name`.
 
@@ -154,7 +1244,104 @@ class MSSQLClient(alch.AlchemyClient):
 
     def list_schemas(self):
         """List all the schemas in the current database."""
-        return self.inspector.get_schema_names()
+        # a new inspector, since the client's one keeps the names it read
+        return list(
+            self._cached_metadata(
+                ('schemas',), lambda: sa.inspect(self.con).get_schema_names()
+            )
+        )
+
+    @property
+    def inspector(self):
+        if self._inspector is None:
+            self._inspector = sa.inspect(self.con)
+        if self._reflection_cache_is_dirty:
+            self.invalidate()
+        return self._inspector
+
+    def _cached_metadata(self, key, load):
+        if self._reflection_cache_is_dirty:
+            self.invalidate()
+        value = self.metadata_cache.get(key)
+        if value is None:
+            value = load()
+            self.metadata_cache.put(key, value)
+        return value
+
+    def _build_ast(self, expr, context):
+        return build_ast(expr, context)
+
+    def _get_sqla_table(self, name, schema=None, autoload=True):
+        def load():
+            # drop an expired definition so that it is reflected again
+            key = sa.schema._get_table_key(name, schema)
+            if key in self.meta.tables:
+                self.meta.remove(self.meta.tables[key])
+            return sa.Table(name, self.meta, schema=schema, autoload=True)
+
+        if not autoload:
+            return super()._get_sqla_table(name, schema=schema, autoload=False)
+        return self._cached_metadata(('table', name, schema), load)
+
+    def invalidate(self, name=None, schema=None):
+        """Discard cached metadata.
+
+        Parameters
+        ----------
+        name : string, optional
+            Only discard the definition of this table and the table listing
+            of its schema. If ``None``, all cached metadata is discarded.
+        schema : string, optional
+            The schema of `name`.
+        """
+        if name is None:
+            self._reflection_cache_is_dirty = False
+            if self._inspector is not None:
+                self._inspector.info_cache.clear()
+            self.metadata_cache.clear()
+            self.meta.clear()
+        else:
+            self.metadata_cache.pop(('table', name, schema))
+            self.metadata_cache.pop(('tables', schema))
+            key = sa.schema._get_table_key(name, schema)
+            if key in self.meta.tables:
+                self.meta.remove(self.meta.tables[key])
+
+    def warm_metadata(self, schema=None):
+        """Reflect every table and view in `schema` with a single query.
+
+        Column definitions are read from ``INFORMATION_SCHEMA`` for the whole
+        schema at once, instead of the several catalog queries SQLAlchemy
+        issues per table, and stored in the metadata cache.
+
+        Parameters
+        ----------
+        schema : string, optional
+            The schema to reflect. If ``None``, the default schema of the
+            connected user is used.
+        """
+        if self._reflection_cache_is_dirty:
+            self.invalidate()
+
+        dialect = self.con.dialect
+        columns = collections.OrderedDict()
+        with self._execute(_WARM_METADATA_QUERY, params=(schema,)) as cur:
+            for row in cur.proxy.fetchall():
+                table_name, column_name, data_type, *type_info, nullable = row
+                coltype = _reflected_type(dialect, data_type, *type_info)
+                columns.setdefault(table_name, []).append(
+                    sa.Column(column_name, coltype, nullable=nullable == 'YES')
+                )
+
+        for table_name, table_columns in columns.items():
+            key = sa.schema._get_table_key(table_name, schema)
+            if key in self.meta.tables:
+                self.meta.remove(self.meta.tables[key])
+            table = sa.Table(
+                table_name, self.meta, *table_columns, schema=schema
+            )
+            self.metadata_cache.put(('table', table_name, schema), table)
+        self.metadata_cache.put(('tables', schema), sorted(columns))
 
     def set_database(self, name):
         """Set current database that client is connected to."""
@@ -167,7 +1354,7 @@ class MSSQLClient(alch.AlchemyClient):
     def client(self):
         return self
 
-    def table(self, name, database=None, schema=None):
+    def table(self, name, database=None, schema=None, hints=None):
         """Create an expression that references a particular table.
 
         Parameters
@@ -180,6 +1367,9 @@ class MSSQLClient(alch.AlchemyClient):
         schema : string, optional
             The schema in which the table resides.  If ``None`` then the
             `public` schema is assumed.
+        hints : list of string, optional
+            Table hints such as ``'NOLOCK'`` or ``'READPAST'`` that queries
+            reading the table add as ``WITH (...)``.
 
         Returns
         -------
@@ -187,10 +1377,19 @@ class MSSQLClient(alch.AlchemyClient):
             A table expression.
         """
         if database is not None and database != self.current_database:
-            return self.database(name=database).table(name=name, schema=schema)
+            return self.database(name=database).table(
+                name=name, schema=schema, hints=hints
+            )
         else:
             alch_table = self._get_sqla_table(name, schema=schema)
-            node = self.table_class(alch_table, self, self._schemas.get(name))
+            hints = tuple(hints or ())
+            if hints:
+                # a private copy, so the hints only apply to this expression
+                alch_table = alch_table.tometadata(sa.MetaData())
+                alch_table.info[TABLE_HINTS_KEY] = hints
+            node = self.table_class(
+                alch_table, self, self._schemas.get(name), hints=hints
+            )
             return self.table_expr_class(node)
 
     def list_tables(self, like=None, database=None, schema=None):
@@ -216,8 +1415,661 @@ class MSSQLClient(alch.AlchemyClient):
                 like=like, schema=schema
             )
         else:
-            parent = super(MSSQLClient, self)
-            return parent.list_tables(like=like, schema=schema)
+
+            def load():
+                # a new inspector, since the client's one keeps the names it
+                # read until everything is invalidated
+                inspector = sa.inspect(self.con)
+                names = inspector.get_table_names(schema=schema)
+                names = names + inspector.get_view_names(schema=schema)
+                return sorted(names)
+
+            names = self._cached_metadata(('tables', schema), load)
+            if like is not None:
+                return [x for x in names if like in x]
+            return list(names)
+
+    def _execute(self, query, results=True, params=None, bind=None):
+        bind = bind if bind is not None else self.con
+        if params:
+            return alch.AlchemyProxy(bind.execute(query, params))
+        return alch.AlchemyProxy(bind.execute(query))
+
+    def _get_query(self, expr, params=None, limit='default', hints=None):
+        """Return a query for `expr` bound to the values in `params`.
+
+        Translation results are cached by the structure of `expr`, `limit`
+        and `hints`; ScalarParameters are compiled to named bind parameters so
+        a cached statement only needs its parameter values replaced. Every
+        parameter of `expr` must be given a value in `params`.
+        """
+        params = params or {}
+        # the SQL of a 'default' limit depends on the option when compiled
+        if limit == 'default':
+            limit_key = limit, ibis.options.sql.default_limit
+        else:
+            limit_key = limit
+        key = expr._key, limit_key, tuple(sorted((hints or {}).items()))
+        entry = self.query_cache.get(key)
+        compile_time = 0.0
+        if entry is None:
+            start = time.perf_counter()
+            query_ast = self._build_ast_ensure_limit(
+                expr, limit, params=params
+            )
+            query = self.query_class(self, query_ast, hints=hints)
+            compiled = query.compiled_sql.compile(dialect=self.con.dialect)
+            compile_time = time.perf_counter() - start
+            query.sql_hash = hashlib.sha256(
+                str(compiled).encode('utf-8')
+            ).hexdigest()[:16]
+            # compiling succeeded, so every parameter of expr was in params
+            required = frozenset(compiled.binds).intersection(
+                param_key(param.op()) for param in params
+            )
+            entry = query, compiled, required
+            self.query_cache.put(key, entry)
+
+        query, compiled, required = entry
+        bind_params = {
+            param_key(param.op()): _bind_value(
+                ibis.literal(value, type=param.type()).op().value
+            )
+            for param, value in params.items()
+        }
+        missing = required.difference(bind_params)
+        if missing:
+            raise KeyError(
+                'No value given for parameters: {}'.format(
+                    ', '.join(sorted(missing))
+                )
+            )
+        query = query.bind(compiled, bind_params)
+        query.compile_time = compile_time
+        return query
+
+    def _table_versions(self, names):
+        """Return when each of the tables in `names` was last modified.
+
+        Versions are ``None`` for objects whose changes can't be tracked,
+        like views and temporary tables, and for tables without a recorded
+        update: the usage statistics are reset when the server restarts, so
+        they may have been modified before.
+        """
+        versions = {}
+        for name in names:
+            with self._execute(_TABLE_VERSION_QUERY, params=(name,)) as cur:
+                row = cur.proxy.fetchone()
+            if row is None or row[0].strip() != 'U' or row[1] is None:
+                versions[name] = None
+            else:
+                versions[name] = row[1].isoformat()
+        return versions
+
+    def add_query_listener(self, listener):
+        """Call `listener` with the measurements of every executed query.
+
+        Parameters
+        ----------
+        listener : callable
+            Called with a :class:`ibis_mssql.metrics.QueryStats` after each
+            :meth:`execute`, e.g. a :class:`ibis_mssql.metrics.QueryMetrics`.
+            While listeners are registered results are fetched row by row,
+            even if the client is columnar, when `server_stats` is set.
+        """
+        self._query_listeners.append(listener)
+
+    def remove_query_listener(self, listener):
+        """Stop calling `listener` for executed queries."""
+        self._query_listeners.remove(listener)
+
+    def query_cache_info(self):
+        """Return hit and miss statistics of the compiled query cache.
+
+        Returns
+        -------
+        CacheInfo
+            A namedtuple of ``hits``, ``misses``, ``maxsize`` and
+            ``currsize``.
+        """
+        return self.query_cache.cache_info()
+
+    def result_cache_info(self):
+        """Return hit and memory statistics of the in-memory result cache.
+
+        Returns
+        -------
+        ResultCacheInfo
+            A namedtuple of ``hits``, ``misses``, ``entries``, ``maxbytes``
+            and ``currbytes`` with a ``hit_rate`` property.
+        """
+        return self.memory_cache.cache_info()
+
+    def execute(
+        self,
+        expr,
+        params=None,
+        limit='default',
+        hints=None,
+        cache=False,
+        **kwargs,
+    ):
+        """Compile and execute the given Ibis expression.
+
+        Parameters
+        ----------
+        expr : Expr
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+            For expressions yielding result sets; retrieve at most this number
+            of values/rows. Overrides any limit already set on the expression.
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+        cache : bool or float, default False
+            If ``True``, return the result from :attr:`result_cache` if the
+            client has one and the tables read by `expr` haven't changed
+            since it was stored, else from :attr:`memory_cache`. A number
+            keeps the result in :attr:`memory_cache` for that many seconds.
+            Results kept in memory aren't checked for changes of the tables
+            they read and are read-only.
+
+        Returns
+        -------
+        output : input type dependent
+          Table expressions: pandas.DataFrame
+          Array expressions: pandas.Series
+          Scalar expressions: Python scalar value
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        return query.execute(cache=cache, **kwargs)
+
+    def compile(self, expr, params=None, limit=None, hints=None):
+        """Compile an expression, reusing the compiled query cache.
+
+        Parameters
+        ----------
+        expr : Expr
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+
+        Returns
+        -------
+        sqlalchemy_expression : sqlalchemy.sql.expression.ClauseElement
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        return query._bound_statement()
+
+    def explain(
+        self, expr, params=None, limit=None, hints=None, large_scan_rows=100000
+    ):
+        """Return the estimated execution plan of an expression.
+
+        The compiled query is sent with ``SET SHOWPLAN_XML ON``, so the
+        server returns its plan without executing it.
+
+        Parameters
+        ----------
+        expr : Expr
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+        large_scan_rows : int, default 100000
+            Scans reading at least this many rows are reported as warnings.
+
+        Returns
+        -------
+        plan : ibis_mssql.plan.QueryPlan
+            The tree of operators with their estimated rows and cost, and
+            warnings about large scans, implicit conversions, missing indexes
+            and spills.
+        """
+        from ibis_mssql.plan import parse_showplan
+
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        with self.con.connect() as bind:
+            # SET SHOWPLAN_XML must be the only statement of its batch
+            bind.execute('SET SHOWPLAN_XML ON')
+            try:
+                xml = self._execute(
+                    query.compiled_sql,
+                    params=query.bind_params,
+                    bind=bind,
+                ).proxy.scalar()
+            finally:
+                bind.execute('SET SHOWPLAN_XML OFF')
+        return parse_showplan(xml, large_scan_rows=large_scan_rows)
+
+    @property
+    def executor(self):
+        """Thread pool running the statements of the async API.
+
+        The pool has as many threads as the engine's connection pool can
+        hand out connections.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                options = self._pool_options
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=options['pool_size'] + options['max_overflow'],
+                    thread_name_prefix='ibis-mssql',
+                )
+            return self._executor
+
+    @contextlib.contextmanager
+    def _cancellable_connection(self, handle):
+        with self.con.connect() as conn:
+            sa.event.listen(conn, 'before_cursor_execute', handle.record)
+            yield conn
+
+    async def _run_async(self, func, handle):
+        return await self._wait_async(self.executor.submit(func), handle)
+
+    async def _wait_async(self, future, handle):
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # the worker thread cannot be interrupted, so cancel the ODBC
+            # statement it is waiting on instead
+            handle.cancel()
+            raise
+
+    async def execute_async(
+        self, expr, params=None, limit='default', hints=None
+    ):
+        """Execute an expression without blocking the event loop.
+
+        The query runs on :attr:`executor`. Cancelling the awaiting task
+        cancels the statement running on the server.
+
+        Parameters
+        ----------
+        expr : Expr
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+            For expressions yielding result sets; retrieve at most this number
+            of values/rows.
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+
+        Returns
+        -------
+        output : input type dependent
+          Table expressions: pandas.DataFrame
+          Array expressions: pandas.Series
+          Scalar expressions: Python scalar value
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        handle = _StatementHandle()
+
+        def run():
+            with self._cancellable_connection(handle) as conn:
+                return query.execute(bind=conn)
+
+        return await self._run_async(run, handle)
+
+    async def execute_iter_async(
+        self, expr, chunksize=10000, params=None, limit=None, hints=None
+    ):
+        """Asynchronously iterate over the result of an expression in chunks.
+
+        This is the asynchronous counterpart of :meth:`execute_iter`, to be
+        used with ``async for``.
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        handle = _StatementHandle()
+
+        def chunks():
+            with self._cancellable_connection(handle) as conn:
+                yield from query.execute_iter(chunksize, bind=conn)
+
+        iterator = chunks()
+        done = object()
+        pending = None
+        try:
+            while True:
+                pending = self.executor.submit(next, iterator, done)
+                chunk = await self._wait_async(pending, handle)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            # release the connection from a worker thread, once the last
+            # chunk's fetch has finished if it was cancelled while running
+            def close(future=None):
+                self.executor.submit(iterator.close)
+
+            if pending is None:
+                close()
+            else:
+                pending.add_done_callback(close)
+
+    def _partition_predicates(self, expr, key, n, params=None):
+        """Split `expr` into at most `n` disjoint ranges of the column `key`.
+
+        Returns a list of predicates covering every row of `expr`, in
+        ascending key order and with null keys last.
+        """
+        column = expr[key]
+        bounds = expr.aggregate(
+            [column.min().name('lo'), column.max().name('hi')]
+        )
+        lo, hi = self.execute(bounds, params=params, limit=None).iloc[0]
+        predicates = []
+        if not pd.isnull(lo):
+            if isinstance(column, ir.IntegerColumn):
+                lo, hi = int(lo), int(hi)
+                edges = [lo + (hi - lo) * i // n for i in range(n + 1)]
+            else:
+                edges = [lo + (hi - lo) * i / n for i in range(n + 1)]
+            # only the inner edges are compared with, so the outer ranges
+            # are open-ended and cover the extremes however the server
+            # rounds the fetched min and max
+            cuts = sorted(set(edges))[1:-1]
+            if cuts:
+                predicates.append(column < cuts[0])
+                for start, stop in zip(cuts[:-1], cuts[1:]):
+                    predicates.append((column >= start) & (column < stop))
+                predicates.append(column >= cuts[-1])
+            else:
+                predicates.append(column.notnull())
+        predicates.append(column.isnull())
+        return predicates
+
+    def execute_parallel(self, expr, partition_by, n=None, params=None):
+        """Execute a table expression as parallel range-partitioned queries.
+
+        The minimum and maximum of `partition_by` are queried first and
+        split into `n` disjoint ranges. One query per range runs
+        concurrently on :attr:`executor`, each on its own pooled connection,
+        and the results are concatenated in ascending key order.
+
+        Parameters
+        ----------
+        expr : TableExpr
+        partition_by : string
+            Name of a numeric or temporal column of `expr` to partition on.
+        n : int, optional
+            Number of partitions. Defaults to the connection pool size.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+
+        Returns
+        -------
+        result : pandas.DataFrame
+            All rows of `expr`; no row limit is applied.
+        """
+        if n is None:
+            n = self._pool_options['pool_size']
+        if n < 1:
+            raise ValueError('n must be a positive integer, got {}'.format(n))
+
+        predicates = self._partition_predicates(expr, partition_by, n, params)
+        futures = [
+            self.executor.submit(
+                self.execute, expr[predicate], params=params, limit=None
+            )
+            for predicate in predicates
+        ]
+        results = [future.result() for future in futures]
+        return pd.concat(results, ignore_index=True)
+
+    def materialize(self, expr, params=None):
+        """Compute a table expression once and store the result on the server.
+
+        The rows of `expr` are inserted into a global temporary table owned by
+        a connection this client keeps open, so queries on any pooled
+        connection can read them. The table is dropped by :meth:`close`, when
+        the client is garbage collected or by the server when that connection
+        ends.
+
+        Global temporary tables can be read by every login on the server
+        that knows their name. The names are random, but don't materialize
+        data other logins must not see.
+
+        Parameters
+        ----------
+        expr : TableExpr
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+
+        Returns
+        -------
+        table : TableExpr
+            A table expression reading the materialized rows.
+        """
+        schema = expr.schema()
+        name = '##ibis_cache_{}'.format(uuid.uuid4().hex)
+        table = sa.Table(
+            name, sa.MetaData(), *self._columns_from_schema(name, schema)
+        )
+        query = self._get_query(expr, params=params, limit=None)
+        statement = table.insert().from_select(
+            schema.names, query._bound_statement()
+        )
+
+        materialized = self._materialized
+        with materialized.lock:
+            if materialized.connection is None:
+                materialized.connection = self.con.connect()
+            with materialized.connection.begin():
+                table.create(bind=materialized.connection)
+                materialized.connection.execute(statement)
+            materialized.tables.append(table)
+
+        node = self.table_class(table, self, schema)
+        return self.table_expr_class(node)
+
+    def execute_iter(
+        self, expr, chunksize=10000, params=None, limit=None, hints=None
+    ):
+        """Execute an expression and yield its result in chunks.
+
+        Parameters
+        ----------
+        expr : Expr
+        chunksize : int, default 10000
+            Number of rows in each yielded chunk.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+            Retrieve at most this number of rows. Unlike ``execute``, no
+            default limit is applied.
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+
+        Yields
+        ------
+        output : input type dependent
+          Table expressions: pandas.DataFrame
+          Array expressions: pandas.Series
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        return query.execute_iter(chunksize)
+
+    def execute_batches(
+        self, expr, chunksize=10000, params=None, limit=None, hints=None
+    ):
+        """Execute a table expression and yield Arrow record batches.
+
+        Each column is filled into a typed NumPy array straight from the
+        cursor and handed to Arrow together with its null mask. Requires
+        ``pyarrow``.
+
+        Parameters
+        ----------
+        expr : TableExpr
+        chunksize : int, default 10000
+            Number of rows in each record batch.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+            Retrieve at most this number of rows.
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+
+        Yields
+        ------
+        batch : pyarrow.RecordBatch
+        """
+        query = self._get_query(expr, params=params, limit=limit, hints=hints)
+        return query.execute_batches(chunksize)
+
+    def export(
+        self,
+        expr,
+        path,
+        format='parquet',
+        row_group_size=100000,
+        params=None,
+        limit=None,
+        hints=None,
+    ):
+        """Write the result of a table expression to a file.
+
+        Rows are streamed from the cursor and written in batches of
+        `row_group_size`, so only one batch is held in memory at a time.
+        Column types are taken from the schema of `expr`. Requires
+        ``pyarrow``.
+
+        Parameters
+        ----------
+        expr : TableExpr
+        path : str
+        format : {'parquet', 'csv'}, default 'parquet'
+        row_group_size : int, default 100000
+            Number of rows in each Parquet row group, or in each batch
+            written to a CSV file.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        limit : int, optional
+            Write at most this number of rows.
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause, e.g.
+            ``{'maxdop': 4, 'recompile': True}``. See
+            :func:`ibis_mssql.compiler.query_hint_text` for the names.
+
+        Returns
+        -------
+        rows : int
+            The number of rows written.
+        """
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+
+            writer_class = pq.ParquetWriter
+        elif format == 'csv':
+            import pyarrow.csv as pcsv
+
+            writer_class = pcsv.CSVWriter
+        else:
+            raise ValueError(
+                "format must be one of 'parquet' or 'csv', got {!r}".format(
+                    format
+                )
+            )
+
+        arrow_schema = _to_arrow_schema(expr.schema())
+        rows = 0
+        with writer_class(path, arrow_schema) as writer:
+            for batch in self.execute_batches(
+                expr,
+                chunksize=row_group_size,
+                params=params,
+                limit=limit,
+                hints=hints,
+            ):
+                # each batch becomes a Parquet row group
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        return rows
+
+    def paginate(self, expr, key, page_size=10000, params=None, hints=None):
+        """Iterate over a table expression in pages using keyset pagination.
+
+        Each page is fetched with ``WHERE key > last_seen ORDER BY key`` and
+        ``TOP page_size``, so with an index on `key` every page costs about
+        the same however deep into the result it is, unlike ``OFFSET``.
+
+        Parameters
+        ----------
+        expr : TableExpr
+        key : string or list of strings
+            Columns that uniquely identify a row. They must not contain nulls.
+        page_size : int, default 10000
+            Number of rows in each page.
+        params : dict, optional
+            ``dict`` mapping :class:`ibis.expr.types.ScalarParameter`
+            objects to values
+        hints : dict, optional
+            Query hints added as an ``OPTION (...)`` clause.
+
+        Yields
+        ------
+        page : pandas.DataFrame
+        """
+        keys = util.promote_list(key)
+        columns = [expr[name] for name in keys]
+        # the position of a page is bound as parameters, so every page after
+        # the first runs the same cached statement
+        last_seen = [ibis.param(column.type()) for column in columns]
+        # compared in the column's type, as the fetched values may be rounded
+        bounds = [
+            CastLikeColumn(param, column).to_expr()
+            for param, column in zip(last_seen, columns)
+        ]
+
+        # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        predicates = []
+        for i, (column, bound) in enumerate(zip(columns, bounds)):
+            predicate = column > bound
+            for previous, previous_bound in zip(columns[:i], bounds[:i]):
+                predicate &= previous == previous_bound
+            predicates.append(predicate)
+        after = functools.reduce(operator.or_, predicates)
+
+        first = expr.sort_by(keys).limit(page_size)
+        following = expr[after].sort_by(keys).limit(page_size)
+
+        params = dict(params or {})
+        page = self.execute(first, params=params, limit=None, hints=hints)
+        while len(page):
+            yield page
+            if len(page) < page_size:
+                return
+            last_row = page.iloc[-1]
+            # NumPy scalars are converted when the values are bound
+            params.update(zip(last_seen, (last_row[name] for name in keys)))
+            page = self.execute(
+                following, params=params, limit=None, hints=hints
+            )
 
     def sql(self, query):
         """
@@ -232,22 +2084,38 @@ class MSSQLClient(alch.AlchemyClient):
         -------
         table : TableExpr
         """
-        limited_query = 'SELECT TOP 0 * FROM ({}) t0'.format(query)
-        schema = self._get_schema_using_query(limited_query)
+        schema = self._get_schema_using_query(query)
         return ops.SQLQueryResult(query, schema, self).to_expr()
 
-    def _get_schema_using_query(self, limited_query):
-        type_map = {
-            int: 'int64',
-            bool: 'boolean',
-            float: 'float64',
-            str: 'string',
-            datetime.datetime: 'timestamp',
-        }
+    def _get_schema_using_query(self, query):
+        """Infer the schema of `query` without executing it.
+
+        The result set is described by ``sp_describe_first_result_set``,
+        which only compiles the query. Schemas are kept in the metadata cache
+        keyed by a hash of the query text.
+        """
+
+        def load():
+            with self._execute(
+                'EXEC sp_describe_first_result_set @tsql = ?', params=(query,)
+            ) as cur:
+                rows = cur.proxy.fetchall()
+            rows = sorted(
+                (row for row in rows if not row.is_hidden),
+                key=lambda row: row.column_ordinal,
+            )
+            return sch.Schema(
+                [row.name for row in rows],
+                [
+                    _type_from_sql_name(
+                        row.system_type_name,
+                        row.precision,
+                        row.scale,
+                        nullable=bool(row.is_nullable),
+                    )
+                    for row in rows
+                ],
+            )
 
-        with self._execute(limited_query, results=True) as cur:
-            names = [row[0] for row in cur.proxy._cursor_description()]
-            ibis_types = [
-                type_map[row[1]] for row in cur.proxy._cursor_description()
-            ]
-        return sch.Schema(names, ibis_types)
+        key = 'query', hashlib.sha256(query.encode('utf-8')).hexdigest()
+        return self._cached_metadata(key, load)
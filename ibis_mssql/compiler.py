@@ -1,16 +1,34 @@
-import pyodbc
+import operator
+
 import sqlalchemy as sa
 import sqlalchemy.dialects.mssql as mssql
+from sqlalchemy.ext import compiler as sa_compiler
+from sqlalchemy.sql import util as sql_util, visitors
+from sqlalchemy.sql.expression import (
+    Alias,
+    ClauseElement,
+    Over,
+    Select,
+)
 
+import ibis
 import ibis.common.exceptions as com
 import ibis.expr.datatypes as dt
 import ibis.expr.operations as ops
+import ibis.expr.rules as rlz
+import ibis.expr.types as ir
 import ibis.sql.alchemy as alch
+from ibis.expr.signature import Argument as Arg
 
 # used for literal translate
 from ibis.sql.alchemy import fixed_arity, unary
 
 
+def param_key(op):
+    """Return the bind parameter name used for a ScalarParameter `op`."""
+    return 'ibis_param_{:d}'.format(op.counter)
+
+
 def raise_unsupported_op_error(translator, expr, *args):
     msg = "SQLServer backend doesn't support {} operation!"
     op = expr.op()
@@ -20,22 +38,67 @@ def raise_unsupported_op_error(translator, expr, *args):
 # Aggregation
 # coppied from postgresql compiler
 # support for of bit columns in aggregate methods
-def _reduction(func_name, cast_type='int32'):
+def _reduction(
+    func_name, cast_type='int32', cast_from=(dt.Boolean,), distinct=False
+):
     def reduction_compiler(t, expr):
         arg, where = expr.op().args
 
-        if arg.type().equals(dt.boolean):
-            arg = arg.cast(cast_type)
-
         func = getattr(sa.func, func_name)
 
+        if isinstance(arg, ir.TableExpr):
+            # COUNT(*)
+            return func()
+
+        if isinstance(arg.type(), cast_from):
+            arg = arg.cast(cast_type)
+
         if where is not None:
             arg = where.ifelse(arg, None)
-        return func(t.translate(arg))
+
+        sa_arg = t.translate(arg)
+        if distinct:
+            sa_arg = sa_arg.distinct()
+        return func(sa_arg)
 
     return reduction_compiler
 
 
+def _approx_count_distinct(t, expr):
+    # APPROX_COUNT_DISTINCT is available from SQL Server 2019
+    if _server_version(t) >= (15,):
+        return _reduction('approx_count_distinct')(t, expr)
+    return _reduction('count', distinct=True)(t, expr)
+
+
+def _approx_median(t, expr):
+    arg, where = expr.op().args
+
+    if _server_version(t) < (16,):
+        raise com.UnsupportedOperationError(
+            'SQLServer backend supports approximate medians from '
+            'SQL Server 2022 on'
+        )
+
+    if where is not None:
+        arg = where.ifelse(arg, None)
+    return sa.func.approx_percentile_cont(0.5).within_group(t.translate(arg))
+
+
+def _quantile(t, expr):
+    arg, quantile, interpolation = expr.op().args
+
+    if isinstance(expr.op(), ops.MultiQuantile) or interpolation != 'linear':
+        raise com.UnsupportedOperationError(
+            'SQLServer backend only supports single quantiles with linear '
+            'interpolation'
+        )
+
+    return sa.func.percentile_cont(t.translate(quantile)).within_group(
+        t.translate(arg)
+    )
+
+
 # String
 # TODO: substr and find are copied from SQLite, we should really have a
 # "base" set of SQL functions that are the most common APIs across the major
@@ -68,12 +131,477 @@ def _string_find(t, expr):
     return sa.func.charindex(sa_substr, sa_arg) - 1
 
 
+def _string_ilike(t, expr):
+    arg, pattern, escape = expr.op().args
+    return sa.func.lower(t.translate(arg)).like(
+        sa.func.lower(t.translate(pattern)), escape=escape
+    )
+
+
+# regular expression escapes with an equivalent T-SQL wildcard class
+_regex_classes = {
+    'd': '[0-9]',
+    'D': '[^0-9]',
+    's': '[ \t\n\r\f\v]',
+    'S': '[^ \t\n\r\f\v]',
+    'w': '[a-zA-Z0-9_]',
+    'W': '[^a-zA-Z0-9_]',
+}
+
+# characters that are wildcards in a LIKE pattern but literals in a regex
+_like_literals = {'%': '[%]', '_': '[_]', '[': '[[]'}
+
+
+def _regex_to_like(pattern):
+    """Rewrite the regular expression `pattern` as a T-SQL LIKE pattern.
+
+    Only anchors, ``.``, ``.*``, ``.+``, escapes and character classes
+    without quantifiers can be expressed with LIKE wildcards.
+
+    Parameters
+    ----------
+    pattern : str
+
+    Returns
+    -------
+    like : str or None
+      The equivalent LIKE pattern, or None if `pattern` uses a construct
+      that LIKE cannot express.
+    """
+    anchored_start = pattern.startswith('^')
+    anchored_end = pattern.endswith('$') and not pattern.endswith('\\$')
+    pattern = pattern[int(anchored_start) : len(pattern) - int(anchored_end)]
+
+    result = [] if anchored_start else ['%']
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        following = pattern[i + 1 : i + 2]
+        if char == '.':
+            if following == '*':
+                result.append('%')
+                i += 1
+            elif following == '+':
+                result.append('_%')
+                i += 1
+            else:
+                result.append('_')
+        elif char == '\\':
+            if not following:
+                return None
+            escaped = _regex_classes.get(following)
+            if escaped is None:
+                if following.isalnum():
+                    # \b, \1, \n and friends have no LIKE equivalent
+                    return None
+                escaped = _like_literals.get(following, following)
+            result.append(escaped)
+            i += 1
+        elif char == '[':
+            # a "]" right after the opening bracket is a member of the class
+            end = pattern.find(']', i + (3 if following == '^' else 2))
+            if end == -1:
+                return None
+            members = pattern[i + 1 : end]
+            if set(members) & set('\\[]'):
+                return None
+            result.append('[{}]'.format(members))
+            i = end
+        elif char in '()|?*+{}^$':
+            return None
+        else:
+            result.append(_like_literals.get(char, char))
+
+        if pattern[i + 1 : i + 2] in ('*', '+', '?', '{'):
+            # quantifiers are only expressible after "."
+            return None
+        i += 1
+
+    if not anchored_end:
+        result.append('%')
+    like = ''.join(result)
+    while '%%' in like:
+        like = like.replace('%%', '%')
+    return like
+
+
+def _regex_search(t, expr):
+    arg, pattern = expr.op().args
+
+    if not isinstance(pattern.op(), ops.Literal):
+        raise com.UnsupportedOperationError(
+            'SQLServer backend only supports literal regular expressions'
+        )
+    like = _regex_to_like(pattern.op().value)
+    if like is None:
+        raise com.UnsupportedOperationError(
+            'SQLServer backend cannot rewrite the regular expression {!r} '
+            'as a LIKE pattern'.format(pattern.op().value)
+        )
+    return t.translate(arg).like(like)
+
+
+# Comparisons
+def _is_bind(expr):
+    return isinstance(expr, ir.Expr) and isinstance(
+        expr.op(), (ops.Literal, ops.ScalarParameter)
+    )
+
+
+def _bind_type(exprs, sa_exprs):
+    """Return the type that literals compared with `exprs` are cast to.
+
+    pyodbc sends Python strings as NVARCHAR, which outranks VARCHAR, so
+    SQL Server converts a VARCHAR column compared with a string parameter
+    and cannot seek an index on it. Casting the literal side to VARCHAR
+    keeps the column as is.
+    """
+    for expr, sa_expr in zip(exprs, sa_exprs):
+        if _is_bind(expr):
+            continue
+        satype = getattr(sa_expr, 'type', None)
+        if isinstance(satype, (sa.CHAR, sa.VARCHAR)) and not isinstance(
+            satype, sa.Unicode
+        ):
+            # unsized, as a cast to the column's length could truncate the
+            # literal into a false match
+            return mssql.VARCHAR()
+    return None
+
+
+class CastLikeColumn(ops.ValueOp):
+    """`arg` converted to the SQL type of `column` if it stores rounded values.
+
+    DATETIME and SMALLDATETIME are compared with Python ``datetime``
+    parameters as DATETIME2, where a DATETIME ``.00333`` is greater than the
+    ``.003`` it is fetched as. Converting a value fetched from such a column
+    back to its type makes them compare equal.
+    """
+
+    arg = Arg(rlz.any)
+    column = Arg(rlz.column(rlz.any))
+
+    def output_type(self):
+        return rlz.shape_like(self.arg, dtype=self.arg.type())
+
+
+def _cast_like_column(t, expr):
+    arg, column = expr.op().args
+    sa_arg = t.translate(arg)
+    satype = getattr(t.translate(column), 'type', None)
+    if isinstance(satype, (sa.DATETIME, mssql.SMALLDATETIME)):
+        return sa.cast(sa_arg, satype)
+    return sa_arg
+
+
+def _typed_binds(sa_func):
+    def formatter(t, expr):
+        args = expr.op().args
+        sa_args = [t.translate(arg) for arg in args]
+        satype = _bind_type(args, sa_args)
+        if satype is not None:
+            sa_args = [
+                sa.cast(sa_arg, satype) if _is_bind(arg) else sa_arg
+                for arg, sa_arg in zip(args, sa_args)
+            ]
+        return sa_func(*sa_args)
+
+    return formatter
+
+
+def _contains(negate):
+    def translator(t, expr):
+        value, options = expr.op().args
+        sa_value = t.translate(value)
+        sa_options = t.translate(options)
+
+        satype = _bind_type([value], [sa_value])
+        if satype is not None and isinstance(sa_options, list):
+            if isinstance(options.op(), ops.ValueList):
+                binds = list(map(_is_bind, options.op().values))
+            else:
+                # a set literal is translated to a list of literals
+                binds = [_is_bind(options)] * len(sa_options)
+            sa_options = [
+                sa.cast(sa_option, satype) if bind else sa_option
+                for bind, sa_option in zip(binds, sa_options)
+            ]
+
+        if negate:
+            return sa_value.notin_(sa_options)
+        return sa_value.in_(sa_options)
+
+    return translator
+
+
+def _string_like(t, expr):
+    arg, pattern, escape = expr.op().args
+    sa_arg, sa_pattern = t.translate(arg), t.translate(pattern)
+    satype = _bind_type([arg], [sa_arg])
+    if satype is not None and _is_bind(pattern):
+        sa_pattern = sa.cast(sa_pattern, satype)
+    return sa_arg.like(sa_pattern, escape=escape)
+
+
 # Numerical
 def _floor_divide(t, expr):
     left, right = map(t.translate, expr.op().args)
     return sa.func.floor(left / right)
 
 
+def _round(t, expr):
+    arg, digits = expr.op().args
+    sa_arg = t.translate(arg)
+
+    if digits is not None:
+        return sa.func.round(sa_arg, t.translate(digits))
+
+    # ROUND requires a length and keeps the type of its argument
+    result = sa.func.round(sa_arg, 0)
+    if isinstance(arg.type(), dt.Decimal):
+        return result
+    return sa.cast(result, mssql.BIGINT)
+
+
+def _log(t, expr):
+    arg, base = expr.op().args
+    sa_arg = t.translate(arg)
+
+    if base is None:
+        return sa.func.log(sa_arg)
+    return sa.func.log(sa_arg, t.translate(base))
+
+
+def _log2(t, expr):
+    return sa.func.log(t.translate(expr.op().arg), 2)
+
+
+def _modulus(t, expr):
+    left, right = expr.op().args
+    sa_left, sa_right = t.translate(left), t.translate(right)
+
+    if isinstance(left.type(), dt.Floating) or isinstance(
+        right.type(), dt.Floating
+    ):
+        # % is not defined for float and real, truncate the quotient instead
+        quotient = sa.func.round(sa_left / sa_right, 0, 1)
+        return sa_left - sa_right * quotient
+    return sa_left % sa_right
+
+
+def _extremum_case(compare, clauses):
+    """Build GREATEST or LEAST from a CASE expression.
+
+    A value is picked when it compares true with every other non-NULL value,
+    so NULLs are ignored the same way SQL Server 2022's functions do. Unlike
+    a subquery over ``VALUES`` it is allowed inside aggregates and GROUP BY.
+    """
+    whens = []
+    for i, clause in enumerate(clauses):
+        others = [
+            sa.or_(compare(clause, other), other.is_(None))
+            for j, other in enumerate(clauses)
+            if j != i
+        ]
+        whens.append((sa.and_(clause.isnot(None), *others), clause))
+    return sa.case(whens, else_=sa.null())
+
+
+def _extremum(func_name, compare):
+    def translator(t, expr):
+        clauses = [t.translate(arg) for arg in expr.op().arg]
+        if _server_version(t) >= (16,):
+            return getattr(sa.func, func_name)(*clauses)
+        return _extremum_case(compare, clauses)
+
+    return translator
+
+
+# Window functions
+# adapted from ibis.sql.alchemy._window for T-SQL, which requires an ORDER BY
+# for ranking and offset functions and for any ROWS/RANGE frame
+_require_order_by = (
+    ops.DenseRank,
+    ops.MinRank,
+    ops.NTile,
+    ops.PercentRank,
+)
+
+_frame_clause_not_allowed = (
+    ops.Lag,
+    ops.Lead,
+    ops.DenseRank,
+    ops.MinRank,
+    ops.NTile,
+    ops.PercentRank,
+    ops.RowNumber,
+)
+
+
+def _window(t, expr):
+    arg, window = expr.op().args
+    window_op = arg.op()
+
+    if isinstance(window_op, ops.CumulativeOp):
+        arg = alch._cumulative_to_window(t, arg, window)
+        return t.translate(arg)
+
+    if window.max_lookback is not None:
+        raise NotImplementedError(
+            'Rows with max lookback is not implemented for SQLServer'
+        )
+
+    if isinstance(window_op, ops.Quantile):
+        # PERCENTILE_CONT is only an analytic function and takes nothing
+        # but PARTITION BY in its OVER clause
+        if window._order_by or window.preceding or window.following:
+            raise com.UnsupportedOperationError(
+                'SQLServer backend does not support ordered or framed '
+                'windows for quantiles'
+            )
+        partition_by = list(map(t.translate, window._group_by))
+        return _quantile(t, arg).over(partition_by=partition_by)
+
+    reduction = t.translate(arg)
+
+    if isinstance(window_op, _require_order_by) and not window._order_by:
+        order_by = [t.translate(window_op.args[0])]
+    else:
+        order_by = list(map(t.translate, window._order_by))
+
+    partition_by = list(map(t.translate, window._group_by))
+
+    preceding, following = window.preceding, window.following
+    if window.how == 'range' and any(
+        bound not in (None, 0) for bound in (preceding, following)
+    ):
+        raise com.UnsupportedOperationError(
+            'SQLServer backend only supports UNBOUNDED and CURRENT ROW '
+            'bounds for RANGE windows'
+        )
+
+    frame = {}
+    if not isinstance(window_op, _frame_clause_not_allowed) and (
+        order_by or preceding is not None or following is not None
+    ):
+        how = {'range': 'range_'}.get(window.how, window.how)
+        frame[how] = (
+            -preceding if preceding is not None else preceding,
+            following,
+        )
+
+    if not order_by and (
+        frame or isinstance(window_op, _frame_clause_not_allowed)
+    ):
+        # no meaningful order: satisfy T-SQL with a constant sort key
+        order_by = [sa.text('(SELECT NULL)')]
+
+    result = reduction.over(
+        partition_by=partition_by, order_by=order_by, **frame
+    )
+
+    if isinstance(
+        window_op, (ops.RowNumber, ops.DenseRank, ops.MinRank, ops.NTile)
+    ):
+        return result - 1
+    else:
+        return result
+
+
+@sa_compiler.compiles(Over, 'mssql')
+def _compile_over(element, compiler, **kw):
+    """Render the offsets of a ROWS frame as integer literals.
+
+    sqlalchemy binds them as parameters, but T-SQL only accepts unsigned
+    integer literals there.
+    """
+    if element.rows is None:
+        return compiler.visit_over(element, **kw)
+
+    unframed = element._clone()
+    unframed.rows = None
+    text = compiler.visit_over(unframed, **kw)
+    frame = compiler._format_frame_clause(
+        element.rows, **dict(kw, literal_binds=True)
+    )
+    # drop the closing parenthesis to append the frame
+    return '{} ROWS BETWEEN {})'.format(text[:-1], frame)
+
+
+def _offset_window_function(func):
+    def translator(t, expr):
+        arg, offset, default = expr.op().args
+
+        sa_args = [t.translate(arg)]
+        if offset is not None or default is not None:
+            sa_args.append(t.translate(offset) if offset is not None else 1)
+        if default is not None:
+            sa_args.append(t.translate(default))
+        return func(*sa_args)
+
+    return translator
+
+
+# Datetime
+_truncate_units = {
+    'Y': 'year',
+    'Q': 'quarter',
+    'M': 'month',
+    'W': 'iso_week',
+    'D': 'day',
+    'h': 'hour',
+    'm': 'minute',
+    's': 'second',
+    'ms': 'millisecond',
+    'us': 'microsecond',
+}
+
+
+def _server_version(t):
+    """Return the version tuple of the server SQL is generated for."""
+    return t.context.dialect.server_version or ()
+
+
+def _truncate_to(datepart, sa_arg, origin):
+    return sa.func.dateadd(
+        datepart, sa.func.datediff(datepart, origin, sa_arg), origin
+    )
+
+
+def _truncate(t, expr):
+    arg, unit = expr.op().args
+    sa_arg = t.translate(arg)
+
+    if unit == 'ns':
+        # datetime2 has a resolution of 100ns, there is nothing to truncate
+        return sa_arg
+
+    datepart = sa.literal_column(_truncate_units[unit])
+    if _server_version(t) >= (16,):
+        return sa.func.datetrunc(datepart, sa_arg)
+
+    if unit in ('h', 'm', 's', 'ms', 'us'):
+        # count from midnight so that DATEDIFF stays within int range
+        origin = sa.cast(sa.cast(sa_arg, mssql.DATE), mssql.DATETIME2)
+        if unit == 'us':
+            # a day holds more microseconds than an int does
+            origin = _truncate_to(sa.literal_column('second'), sa_arg, origin)
+    else:
+        origin = sa.cast(sa.literal_column("'1900-01-01'"), mssql.DATETIME2)
+
+    if unit == 'W':
+        # DATEDIFF(week, ...) counts Sundays, so count whole weeks of days
+        # from 1900-01-01, a Monday, to match DATETRUNC(iso_week, ...)
+        day = sa.literal_column('day')
+        days = sa.func.datediff(day, origin, sa_arg)
+        result = sa.func.dateadd(day, days - days % 7, origin)
+    else:
+        result = _truncate_to(datepart, sa_arg, origin)
+    if isinstance(expr.op(), ops.DateTruncate):
+        return sa.cast(result, mssql.DATE)
+    return result
+
+
 def _extract(fmt):
     def translator(t, expr):
         (arg,) = expr.op().args
@@ -88,15 +616,32 @@ def _extract(fmt):
 
 
 _operation_registry = alch._operation_registry.copy()
+_operation_registry.update(alch._window_functions)
 
 _operation_registry.update(
     {
+        # comparisons
+        CastLikeColumn: _cast_like_column,
+        ops.Equals: _typed_binds(operator.eq),
+        ops.NotEquals: _typed_binds(operator.ne),
+        ops.Less: _typed_binds(operator.lt),
+        ops.LessEqual: _typed_binds(operator.le),
+        ops.Greater: _typed_binds(operator.gt),
+        ops.GreaterEqual: _typed_binds(operator.ge),
+        ops.Between: _typed_binds(sa.between),
+        ops.Contains: _contains(negate=False),
+        ops.NotContains: _contains(negate=True),
+        ops.StringSQLLike: _string_like,
         # aggregate methods
-        ops.Count: _reduction(sa.func.count),
+        ops.Count: _reduction('count'),
+        ops.CountDistinct: _reduction('count', distinct=True),
+        ops.HLLCardinality: _approx_count_distinct,
+        ops.CMSMedian: _approx_median,
         ops.Max: _reduction('max'),
         ops.Min: _reduction('min'),
         ops.Sum: _reduction('sum'),
-        ops.Mean: _reduction('avg', 'float64'),
+        # AVG of an integer column is an integer in T-SQL
+        ops.Mean: _reduction('avg', 'float64', (dt.Boolean, dt.Integer)),
         # string methods
         ops.LStrip: unary(sa.func.ltrim),
         ops.Lowercase: unary(sa.func.lower),
@@ -104,6 +649,8 @@ _operation_registry.update(
         ops.Repeat: fixed_arity(sa.func.replicate, 2),
         ops.Reverse: unary(sa.func.reverse),
         ops.StringFind: _string_find,
+        ops.StringSQLILike: _string_ilike,
+        ops.RegexSearch: _regex_search,
         ops.StringLength: unary(sa.func.length),
         ops.StringReplace: fixed_arity(sa.func.replace, 3),
         ops.Strip: unary(sa.func.trim),
@@ -117,9 +664,19 @@ _operation_registry.update(
         ops.Atan: unary(sa.func.atan),
         ops.Ceil: unary(sa.func.ceiling),
         ops.Cos: unary(sa.func.cos),
+        ops.Exp: unary(sa.func.exp),
         ops.Floor: unary(sa.func.floor),
         ops.FloorDivide: _floor_divide,
+        ops.Greatest: _extremum('greatest', operator.ge),
+        ops.Least: _extremum('least', operator.le),
+        ops.Ln: unary(sa.func.log),
+        ops.Log: _log,
+        ops.Log10: unary(sa.func.log10),
+        ops.Log2: _log2,
+        ops.Modulus: _modulus,
+        ops.NullIf: fixed_arity(sa.func.nullif, 2),
         ops.Power: fixed_arity(sa.func.power, 2),
+        ops.Round: _round,
         ops.Sign: unary(sa.func.sign),
         ops.Sin: unary(sa.func.sin),
         ops.Sqrt: unary(sa.func.sqrt),
@@ -133,43 +690,30 @@ _operation_registry.update(
         ops.ExtractMinute: _extract('minute'),
         ops.ExtractSecond: _extract('second'),
         ops.ExtractMillisecond: _extract('millisecond'),
+        ops.TimestampTruncate: _truncate,
+        ops.DateTruncate: _truncate,
+        # window functions
+        ops.WindowOp: _window,
+        ops.CumulativeOp: _window,
+        ops.Lag: _offset_window_function(sa.func.lag),
+        ops.Lead: _offset_window_function(sa.func.lead),
     }
 )
 
 
 _unsupported_ops = [
     # standard operations
-    ops.NotContains,
-    ops.NullIf,
     ops.NotAny,
-    # miscellaneous
-    ops.Least,
-    ops.Greatest,
-    # numeric
-    ops.Round,
-    ops.Log2,
-    ops.Ln,
-    ops.Log10,
-    ops.Log,
-    ops.Exp,
-    ops.Modulus,
+    # aggregate methods, exact quantiles are only available over a window
+    ops.Quantile,
+    ops.MultiQuantile,
     # string
-    ops.Contains,
     ops.LPad,
     ops.RPad,
     ops.Capitalize,
-    ops.RegexSearch,
     ops.RegexExtract,
     ops.RegexReplace,
     ops.StringAscii,
-    ops.StringSQLLike,
-    # aggregate methods
-    ops.CumulativeMax,
-    ops.CumulativeMin,
-    ops.CumulativeMean,
-    ops.CumulativeSum,
-    # datetime methods
-    ops.TimestampTruncate,
 ]
 
 
@@ -177,22 +721,193 @@ _unsupported_ops = {k: raise_unsupported_op_error for k in _unsupported_ops}
 _operation_registry.update(_unsupported_ops)
 
 
+class MSSQLContext(alch.AlchemyContext):
+    def _to_sql(self, expr, ctx):
+        return to_sqlalchemy(expr, ctx)
+
+
 class MSSQLExprTranslator(alch.AlchemyExprTranslator):
+    context_class = MSSQLContext
     _registry = _operation_registry
     _rewrites = alch.AlchemyExprTranslator._rewrites.copy()
     _type_map = alch.AlchemyExprTranslator._type_map.copy()
     _type_map.update(
         {
-            dt.Boolean: pyodbc.SQL_BIT,
+            dt.Boolean: mssql.BIT,
             dt.Int8: mssql.TINYINT,
             dt.Int32: mssql.INTEGER,
             dt.Int64: mssql.BIGINT,
             dt.Float: mssql.REAL,
-            dt.Double: mssql.REAL,
+            dt.Double: mssql.FLOAT(53),
             dt.String: mssql.VARCHAR,
         }
     )
 
+    def _trans_param(self, expr):
+        # bind scalar parameters by name rather than as anonymous literals,
+        # so a compiled statement can be executed again with new values
+        op = expr.op()
+        raw_value = self.context.params[op]
+        value = ibis.literal(raw_value, type=expr.type()).op().value
+        return sa.bindparam(param_key(op), value)
+
+
+# Hints
+# options accepted by ``hints``; flags are rendered when their value is true
+_query_hints = {
+    'maxdop': 'MAXDOP {:d}',
+    'recompile': 'RECOMPILE',
+    'optimize_for_unknown': 'OPTIMIZE FOR UNKNOWN',
+    'fast': 'FAST {:d}',
+    'max_grant_percent': 'MAX_GRANT_PERCENT = {:g}',
+    'hash_join': 'HASH JOIN',
+    'loop_join': 'LOOP JOIN',
+    'merge_join': 'MERGE JOIN',
+    'hash_group': 'HASH GROUP',
+    'order_group': 'ORDER GROUP',
+    'force_order': 'FORCE ORDER',
+}
+
+# key of the table hints in the ``info`` of a hinted sqlalchemy table
+TABLE_HINTS_KEY = 'mssql_table_hints'
+
+
+def query_hint_text(hints):
+    """Return the ``OPTION (...)`` clause for the query hints in `hints`.
+
+    Parameters
+    ----------
+    hints : dict
+      Maps a name in ``maxdop``, ``recompile``, ``optimize_for_unknown``,
+      ``fast``, ``max_grant_percent``, ``hash_join``, ``loop_join``,
+      ``merge_join``, ``hash_group``, ``order_group`` or ``force_order`` to
+      its value.
+
+    Returns
+    -------
+    text : str or None
+    """
+    options = []
+    for name, value in sorted(hints.items()):
+        try:
+            template = _query_hints[name]
+        except KeyError:
+            raise com.IbisInputError(
+                'Unknown query hint {!r}, expected one of {}'.format(
+                    name, ', '.join(sorted(_query_hints))
+                )
+            )
+        if '{' in template:
+            options.append(template.format(value))
+        elif value:
+            options.append(template)
+    if not options:
+        return None
+    return 'OPTION ({})'.format(', '.join(options))
+
+
+def add_hints(statement, hints=None):
+    """Attach table hints and the query hints in `hints` to `statement`.
+
+    Table hints are read from the ``info`` of the sqlalchemy tables the
+    statement selects from and rendered as ``WITH (...)`` after their
+    alias. `statement` is modified in place.
+
+    Returns
+    -------
+    statement : sqlalchemy.sql.expression.Select
+    """
+    for select in visitors.iterate(statement, {}):
+        if not isinstance(select, Select):
+            continue
+        for from_ in select.froms:
+            for table in sql_util.surface_selectables(from_):
+                if not isinstance(table, Alias) or not isinstance(
+                    table.original, sa.Table
+                ):
+                    continue
+                table_hints = table.original.info.get(TABLE_HINTS_KEY)
+                if table_hints:
+                    text = 'WITH ({})'.format(', '.join(table_hints))
+                    select._hints = select._hints.union(
+                        {(table, 'mssql'): text}
+                    )
+
+    text = query_hint_text(hints or {})
+    if text is not None:
+        if not isinstance(statement, Select):
+            # OPTION can only be attached to a plain SELECT
+            statement = sa.select([sa.text('*')]).select_from(
+                statement.alias()
+            )
+        # a suffix rather than a statement hint, to follow OFFSET ... FETCH
+        statement = statement.suffix_with(text, dialect='mssql')
+    return statement
+
+
+# Query building
+class _OffsetFetch(ClauseElement):
+    """``ORDER BY ... OFFSET n ROWS FETCH NEXT m ROWS ONLY``.
+
+    sqlalchemy emulates OFFSET on SQL Server with ROW_NUMBER() in a subquery,
+    which drops the ordering of the result, and omits ORDER BY from
+    subqueries without TOP. This renders the whole clause natively instead.
+    """
+
+    def __init__(self, order_by, offset, n=None):
+        self.order_by = order_by
+        self.offset = offset
+        self.n = n
+
+
+@sa_compiler.compiles(_OffsetFetch)
+def _compile_offset_fetch(element, compiler, **kw):
+    order_by = compiler.process(element.order_by, **kw) or '(SELECT NULL)'
+    text = 'ORDER BY {} OFFSET {:d} ROWS'.format(order_by, element.offset)
+    if element.n is not None:
+        text += ' FETCH NEXT {:d} ROWS ONLY'.format(element.n)
+    return text
+
+
+class MSSQLSelect(alch.AlchemySelect):
+    def _add_limit(self, fragment):
+        if self.limit is None:
+            return fragment
+
+        n, offset = self.limit['n'], self.limit['offset']
+        if not offset:
+            # rendered as TOP n
+            return fragment.limit(n)
+
+        clause = _OffsetFetch(fragment._order_by_clause, offset, n)
+        return fragment.order_by(None).suffix_with(clause, dialect='mssql')
+
+
+class MSSQLSelectBuilder(alch.AlchemySelectBuilder):
+    @property
+    def _select_class(self):
+        return MSSQLSelect
+
+
+class MSSQLQueryBuilder(alch.AlchemyQueryBuilder):
+
+    select_builder = MSSQLSelectBuilder
+
+
+def build_ast(expr, context):
+    builder = MSSQLQueryBuilder(expr, context)
+    return builder.get_result()
+
+
+def to_sqlalchemy(expr, context, exists=False):
+    ast = build_ast(expr, context)
+    query = ast.queries[0]
+
+    if exists:
+        query.exists = exists
+
+    return query.compile()
+
 
 rewrites = MSSQLExprTranslator.rewrites
 compiles = MSSQLExprTranslator.compiles
@@ -202,5 +917,16 @@ class MSSQLDialect(alch.AlchemyDialect):
 
     translator = MSSQLExprTranslator
 
+    # version tuple of the server that SQL is generated for; ``None`` limits
+    # the output to constructs every supported version understands
+    server_version = None
+
+    @classmethod
+    def for_server_version(cls, server_version):
+        """Return a dialect generating SQL for `server_version`."""
+        return type(
+            cls.__name__, (cls,), {'server_version': tuple(server_version)}
+        )
+
 
 dialect = MSSQLDialect
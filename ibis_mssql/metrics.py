@@ -0,0 +1,151 @@
+"""Per-query instrumentation for the MSSQL client."""
+
+import collections
+import re
+import threading
+
+QueryStats = collections.namedtuple(
+    'QueryStats',
+    [
+        'sql_hash',
+        'sql',
+        'compile_time',
+        'execute_time',
+        'fetch_time',
+        'rows',
+        'bytes',
+        'server_stats',
+    ],
+)
+QueryStats.__doc__ = """Measurements of a single query execution.
+
+Attributes
+----------
+sql_hash : str
+    Hash of the SQL text, identifying executions of the same statement.
+sql : str
+    The SQL text, with placeholders for bound parameters.
+compile_time : float
+    Seconds spent translating the expression, 0 if the compiled statement
+    was served from the client's query cache.
+execute_time : float
+    Seconds until the server returned the first row.
+fetch_time : float
+    Seconds spent fetching and converting the result.
+rows : int
+    Number of rows fetched.
+bytes : int
+    In-memory size of the fetched result.
+server_stats : dict or None
+    ``logical_reads``, ``physical_reads``, ``cpu_time_ms`` and
+    ``elapsed_time_ms`` reported by ``SET STATISTICS IO, TIME ON`` when the
+    client captures them, else ``None``.
+"""
+
+_statistics_patterns = {
+    'logical_reads': re.compile(r'logical reads (\d+)'),
+    'physical_reads': re.compile(r'physical reads (\d+)'),
+}
+_execution_time = re.compile(
+    r'Execution Times:\s*CPU time = (\d+) ms,\s*elapsed time = (\d+) ms'
+)
+
+
+def parse_statistics(messages):
+    """Sum the ``SET STATISTICS IO, TIME ON`` output in `messages`.
+
+    Parameters
+    ----------
+    messages : list of str
+        Informational messages returned by SQL Server with a result set.
+
+    Returns
+    -------
+    stats : dict
+    """
+    names = 'logical_reads', 'physical_reads', 'cpu_time_ms', 'elapsed_time_ms'
+    stats = dict.fromkeys(names, 0)
+    for message in messages:
+        for name, pattern in _statistics_patterns.items():
+            stats[name] += sum(map(int, pattern.findall(message)))
+        for cpu, elapsed in _execution_time.findall(message):
+            stats['cpu_time_ms'] += int(cpu)
+            stats['elapsed_time_ms'] += int(elapsed)
+    return stats
+
+
+class QueryMetrics:
+    """A query listener aggregating :class:`QueryStats` per statement.
+
+    Register an instance with :meth:`MSSQLClient.add_query_listener`.
+
+    Parameters
+    ----------
+    maxlen : int, default 1000
+        Number of recent executions kept by :meth:`records`.
+    """
+
+    _counters = [
+        ('queries', 'Number of executed queries'),
+        ('compile_seconds', 'Seconds spent translating expressions'),
+        ('execute_seconds', 'Seconds until the first row was returned'),
+        ('fetch_seconds', 'Seconds spent fetching results'),
+        ('rows', 'Number of fetched rows'),
+        ('bytes', 'In-memory size of fetched results'),
+        ('logical_reads', 'Logical reads reported by the server'),
+        ('cpu_time_ms', 'CPU milliseconds reported by the server'),
+    ]
+
+    def __init__(self, maxlen=1000):
+        self._lock = threading.Lock()
+        self._records = collections.deque(maxlen=maxlen)
+        self._totals = {}
+
+    def __call__(self, stats):
+        server_stats = stats.server_stats or {}
+        with self._lock:
+            self._records.append(stats)
+            totals = self._totals.setdefault(
+                stats.sql_hash, dict.fromkeys(dict(self._counters), 0)
+            )
+            totals['queries'] += 1
+            totals['compile_seconds'] += stats.compile_time
+            totals['execute_seconds'] += stats.execute_time
+            totals['fetch_seconds'] += stats.fetch_time
+            totals['rows'] += stats.rows
+            totals['bytes'] += stats.bytes
+            totals['logical_reads'] += server_stats.get('logical_reads', 0)
+            totals['cpu_time_ms'] += server_stats.get('cpu_time_ms', 0)
+
+    def records(self):
+        """Return the most recent executions as a list of dicts."""
+        with self._lock:
+            return [stats._asdict() for stats in self._records]
+
+    def totals(self):
+        """Return the aggregated counters of each statement by its hash."""
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def to_prometheus(self, prefix='ibis_mssql'):
+        """Render the counters in the Prometheus text exposition format.
+
+        Each counter is labelled with the ``sql_hash`` of its statement.
+
+        Returns
+        -------
+        text : str
+        """
+        totals = self.totals()
+        lines = []
+        for name, help_text in self._counters:
+            metric = '{}_{}_total'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(metric, help_text))
+            lines.append('# TYPE {} counter'.format(metric))
+            for sql_hash, values in sorted(totals.items()):
+                lines.append(
+                    '{}{{sql_hash="{}"}} {}'.format(
+                        metric, sql_hash, values[name]
+                    )
+                )
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,324 @@
+"""Parsing of SQL Server estimated execution plans (``SHOWPLAN_XML``)."""
+
+import collections
+import xml.etree.ElementTree as ET
+
+_NS = '{http://schemas.microsoft.com/sqlserver/2004/07/showplan}'
+
+# physical operators reading a whole table or index
+_SCAN_OPS = frozenset(['Table Scan', 'Clustered Index Scan', 'Index Scan'])
+
+# warnings that mean an operator is expected to spill to tempdb
+_SPILL_WARNINGS = frozenset(
+    ['SpillToTempDb', 'SortSpillDetails', 'HashSpillDetails']
+)
+
+PlanWarning = collections.namedtuple(
+    'PlanWarning', ['kind', 'message', 'node_id']
+)
+PlanWarning.__doc__ = """A problem found in an execution plan.
+
+Attributes
+----------
+kind : str
+    One of ``'scan'``, ``'implicit_conversion'``, ``'missing_index'``,
+    ``'spill'``, ``'no_join_predicate'`` or ``'no_statistics'``.
+message : str
+node_id : int or None
+    Id of the operator the warning belongs to, ``None`` for warnings about
+    the whole statement.
+"""
+
+
+class PlanNode:
+    """An operator of an execution plan.
+
+    Attributes
+    ----------
+    node_id : int
+    physical_op : str
+        E.g. ``'Hash Match'`` or ``'Clustered Index Seek'``.
+    logical_op : str
+        E.g. ``'Aggregate'`` or ``'Inner Join'``.
+    estimated_rows : float
+    estimated_cost : float
+        Estimated cost of this operator and all its inputs.
+    parallel : bool
+    object : str or None
+        The table or index read by the operator.
+    children : list of PlanNode
+    """
+
+    def __init__(
+        self,
+        node_id,
+        physical_op,
+        logical_op,
+        estimated_rows,
+        estimated_cost,
+        parallel,
+        object=None,
+        children=None,
+    ):
+        self.node_id = node_id
+        self.physical_op = physical_op
+        self.logical_op = logical_op
+        self.estimated_rows = estimated_rows
+        self.estimated_cost = estimated_cost
+        self.parallel = parallel
+        self.object = object
+        self.children = children or []
+
+    def __repr__(self):
+        return '{}(node_id={}, physical_op={!r}, estimated_rows={})'.format(
+            type(self).__name__,
+            self.node_id,
+            self.physical_op,
+            self.estimated_rows,
+        )
+
+    def walk(self):
+        """Yield this operator and all operators below it, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_text(self, indent=0):
+        line = '{}{} ({}) rows={:g} cost={:g}{}{}'.format(
+            '  ' * indent,
+            self.physical_op,
+            self.logical_op,
+            self.estimated_rows,
+            self.estimated_cost,
+            ' parallel' if self.parallel else '',
+            ' on {}'.format(self.object) if self.object else '',
+        )
+        return '\n'.join(
+            [line] + [child.to_text(indent + 1) for child in self.children]
+        )
+
+
+class QueryPlan:
+    """The estimated execution plan of a statement.
+
+    Attributes
+    ----------
+    root : PlanNode
+    estimated_cost : float
+        Estimated cost of the whole statement.
+    estimated_rows : float
+    degree_of_parallelism : int or None
+    warnings : list of PlanWarning
+    xml : str
+        The showplan document the plan was parsed from.
+    """
+
+    def __init__(
+        self,
+        root,
+        estimated_cost,
+        estimated_rows,
+        degree_of_parallelism,
+        warnings,
+        xml,
+    ):
+        self.root = root
+        self.estimated_cost = estimated_cost
+        self.estimated_rows = estimated_rows
+        self.degree_of_parallelism = degree_of_parallelism
+        self.warnings = warnings
+        self.xml = xml
+
+    def __repr__(self):
+        return '{}(estimated_cost={:g}, warnings={})'.format(
+            type(self).__name__, self.estimated_cost, len(self.warnings)
+        )
+
+    def __str__(self):
+        return self.to_text()
+
+    def walk(self):
+        """Yield every operator of the plan, depth first."""
+        return self.root.walk()
+
+    def to_text(self):
+        lines = [self.root.to_text()]
+        lines.extend(
+            'warning: {}: {}'.format(warning.kind, warning.message)
+            for warning in self.warnings
+        )
+        return '\n'.join(lines)
+
+
+def _local(tag):
+    return tag[len(_NS) :] if tag.startswith(_NS) else tag
+
+
+def _child_relops(element):
+    """Yield the operators directly below `element`."""
+    for child in element:
+        if child.tag == _NS + 'RelOp':
+            yield child
+        else:
+            yield from _child_relops(child)
+
+
+def _object_name(relop):
+    for op_element in relop:
+        obj = op_element.find(_NS + 'Object')
+        if obj is not None:
+            parts = [
+                obj.get(name)
+                for name in ('Database', 'Schema', 'Table')
+                if obj.get(name)
+            ]
+            name = '.'.join(parts)
+            if obj.get('Index'):
+                name += '.' + obj.get('Index')
+            return name
+    return None
+
+
+def _operator_warnings(element, node_id):
+    warnings_element = element.find(_NS + 'Warnings')
+    if warnings_element is None:
+        return []
+
+    warnings = []
+    if warnings_element.get('NoJoinPredicate') in ('1', 'true'):
+        warnings.append(
+            PlanWarning(
+                'no_join_predicate', 'join without a predicate', node_id
+            )
+        )
+    for warning in warnings_element:
+        kind = _local(warning.tag)
+        if kind == 'PlanAffectingConvert':
+            warnings.append(
+                PlanWarning(
+                    'implicit_conversion',
+                    '{} may affect {}'.format(
+                        warning.get('Expression'), warning.get('ConvertIssue')
+                    ),
+                    node_id,
+                )
+            )
+        elif kind in _SPILL_WARNINGS:
+            warnings.append(
+                PlanWarning('spill', 'operator spills to tempdb', node_id)
+            )
+        elif kind == 'ColumnsWithNoStatistics':
+            columns = [
+                column.get('Column')
+                for column in warning.iter(_NS + 'ColumnReference')
+            ]
+            warnings.append(
+                PlanWarning(
+                    'no_statistics',
+                    'no statistics on {}'.format(', '.join(columns)),
+                    node_id,
+                )
+            )
+    return warnings
+
+
+def _parse_relop(relop, large_scan_rows, warnings):
+    node_id = int(relop.get('NodeId'))
+    node = PlanNode(
+        node_id=node_id,
+        physical_op=relop.get('PhysicalOp'),
+        logical_op=relop.get('LogicalOp'),
+        estimated_rows=float(relop.get('EstimateRows', 0)),
+        estimated_cost=float(relop.get('EstimatedTotalSubtreeCost', 0)),
+        parallel=relop.get('Parallel') in ('1', 'true'),
+        object=_object_name(relop),
+    )
+    rows_read = float(
+        relop.get('EstimatedRowsRead')
+        or relop.get('TableCardinality')
+        or node.estimated_rows
+    )
+    if node.physical_op in _SCAN_OPS and rows_read >= large_scan_rows:
+        warnings.append(
+            PlanWarning(
+                'scan',
+                '{} of {} reads {:g} rows'.format(
+                    node.physical_op, node.object, rows_read
+                ),
+                node_id,
+            )
+        )
+    warnings.extend(_operator_warnings(relop, node_id))
+    node.children = [
+        _parse_relop(child, large_scan_rows, warnings)
+        for child in _child_relops(relop)
+    ]
+    return node
+
+
+def _missing_index_warnings(query_plan):
+    warnings = []
+    for group in query_plan.iter(_NS + 'MissingIndexGroup'):
+        for index in group.iter(_NS + 'MissingIndex'):
+            columns = {
+                column_group.get('Usage'): [
+                    column.get('Name') for column in column_group
+                ]
+                for column_group in index.iter(_NS + 'ColumnGroup')
+            }
+            warnings.append(
+                PlanWarning(
+                    'missing_index',
+                    'index on {}.{}.{} ({}) would improve the cost by '
+                    '{}%'.format(
+                        index.get('Database'),
+                        index.get('Schema'),
+                        index.get('Table'),
+                        '; '.join(
+                            '{}: {}'.format(usage, ', '.join(names))
+                            for usage, names in columns.items()
+                        ),
+                        group.get('Impact'),
+                    ),
+                    None,
+                )
+            )
+    return warnings
+
+
+def parse_showplan(xml, large_scan_rows=100000):
+    """Parse a ``SHOWPLAN_XML`` document into a :class:`QueryPlan`.
+
+    Parameters
+    ----------
+    xml : str
+    large_scan_rows : int, default 100000
+        Scans reading at least this many rows are reported as warnings.
+
+    Returns
+    -------
+    plan : QueryPlan
+        The plan of the last statement in `xml`.
+    """
+    document = ET.fromstring(xml)
+    statement = None
+    for statement in document.iter(_NS + 'StmtSimple'):
+        pass
+    if statement is None or statement.find(_NS + 'QueryPlan') is None:
+        raise ValueError('The showplan document contains no query plan')
+
+    query_plan = statement.find(_NS + 'QueryPlan')
+    warnings = _missing_index_warnings(query_plan)
+    warnings.extend(_operator_warnings(query_plan, None))
+    root = _parse_relop(
+        query_plan.find(_NS + 'RelOp'), large_scan_rows, warnings
+    )
+    dop = query_plan.get('DegreeOfParallelism')
+    return QueryPlan(
+        root=root,
+        estimated_cost=float(statement.get('StatementSubTreeCost', 0)),
+        estimated_rows=float(statement.get('StatementEstRows', 0)),
+        degree_of_parallelism=int(dop) if dop is not None else None,
+        warnings=warnings,
+        xml=xml,
+    )
@@ -0,0 +1,87 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from ibis_mssql.cache import MemoryResultCache, ResultCache, result_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    pytest.importorskip('pyarrow')
+    return ResultCache(str(tmp_path))
+
+
+def test_result_cache_roundtrip(cache):
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', None]})
+    key = result_key('url', 'SELECT 1')
+    assert cache.get(key, {'[t]': ''}) is None
+
+    cache.put(key, df, {'[t]': ''})
+    tm.assert_frame_equal(cache.get(key, {'[t]': ''}), df)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_cache_invalidated_by_version(cache):
+    key = result_key('url', 'SELECT 1')
+    cache.put(key, pd.DataFrame({'a': [1]}), {'[t]': '2020-01-01T00:00:00'})
+    assert cache.get(key, {'[t]': '2020-01-02T00:00:00'}) is None
+    # the stale entry is removed
+    assert cache.get(key, {'[t]': '2020-01-01T00:00:00'}) is None
+
+
+def test_result_cache_table_versions(tmp_path):
+    cache = ResultCache(str(tmp_path), check_interval=60)
+    calls = []
+
+    def load(names):
+        calls.append(names)
+        return dict.fromkeys(names, 'v1')
+
+    assert cache.table_versions(['[a]'], load) == {'[a]': 'v1'}
+    assert cache.table_versions(['[a]', '[b]'], load) == {
+        '[a]': 'v1',
+        '[b]': 'v1',
+    }
+    assert calls == [['[a]'], ['[b]']]
+
+
+def test_memory_cache_read_only():
+    cache = MemoryResultCache()
+    df = pd.DataFrame({'a': [1, 2], 'b': pd.array([1, None], dtype='Int64')})
+    result = cache.put('key', df)
+    hit = cache.get('key')
+    tm.assert_frame_equal(hit, df)
+    assert hit is not result
+
+    with pytest.raises(ValueError):
+        hit.iloc[0, 0] = 0
+    # adding columns to a returned frame doesn't change the cached one
+    hit['c'] = 1
+    assert list(cache.get('key').columns) == ['a', 'b']
+
+
+def test_memory_cache_evicts_by_size():
+    df = pd.DataFrame({'a': range(100)})
+    nbytes = int(df.memory_usage(deep=True).sum())
+    cache = MemoryResultCache(maxbytes=2 * nbytes)
+    cache.put('a', df.copy())
+    cache.put('b', df.copy())
+    cache.get('a')
+    cache.put('c', df.copy())
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    info = cache.cache_info()
+    assert (info.entries, info.currbytes) == (2, 2 * nbytes)
+    assert info.hit_rate == 2 / 3
+
+
+def test_memory_cache_ttl(monkeypatch):
+    cache = MemoryResultCache()
+    now = [100.0]
+    monkeypatch.setattr('time.monotonic', lambda: now[0])
+    cache.put('key', pd.DataFrame({'a': [1]}), ttl=10)
+    assert cache.get('key') is not None
+    now[0] += 11
+    assert cache.get('key') is None
+    assert cache.cache_info().entries == 0
@@ -0,0 +1,451 @@
+import asyncio
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+import ibis
+import ibis.common.exceptions as com
+import ibis.expr.datatypes as dt
+
+import ibis_mssql
+from ibis_mssql.cache import MemoryResultCache, memory_cache
+
+
+@pytest.fixture
+def temp_table(backend):
+    name = 'ibis_mssql_temp_table'
+    yield name
+    backend.drop_table(name, force=True)
+
+
+def test_load_data(backend, temp_table):
+    df = pd.DataFrame(
+        {
+            'id': [1, 2, 3],
+            'value': [1.5, None, 3.5],
+            'name': ['a', None, 'c'],
+            'ts': pd.to_datetime(['2020-01-01', None, '2020-01-03']),
+        }
+    )
+    backend.load_data(temp_table, df, chunksize=2)
+    result = backend.table(temp_table).execute().sort_values('id')
+    tm.assert_frame_equal(result.reset_index(drop=True), df)
+
+    with pytest.raises(com.IntegrityError):
+        backend.load_data(temp_table, df)
+
+    backend.load_data(temp_table, df, if_exists='append')
+    assert backend.table(temp_table).count().execute() == 6
+
+    backend.load_data(temp_table, df, if_exists='replace')
+    assert backend.table(temp_table).count().execute() == 3
+
+
+def test_database_client_reuses_engine(backend):
+    tempdb = backend.database('tempdb')
+    assert tempdb.client is backend.database('tempdb').client
+    assert tempdb.client.con.url.query == backend.con.url.query
+    assert tempdb.client.list_tables() == backend.list_tables(
+        database='tempdb'
+    )
+
+
+def test_connect_reuses_engine(backend):
+    url = backend.con.url
+    con = ibis_mssql.connect(url=str(url))
+    assert con.con is backend.con
+
+
+def test_execute_iter(backend, alltypes, sorted_df):
+    expr = alltypes.sort_by('id')
+    chunks = list(backend.execute_iter(expr, chunksize=1000))
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1])
+    result = pd.concat(chunks, ignore_index=True)
+    tm.assert_frame_equal(result, sorted_df)
+
+
+def test_columnar_fetch(backend, sorted_df):
+    url = backend.con.url
+    con = ibis_mssql.connect(url=str(url), columnar=True)
+    expr = con.table('functional_alltypes').sort_by('id')
+    result = expr.execute()
+    tm.assert_frame_equal(result, sorted_df, check_dtype=False)
+
+    pytest.importorskip('pyarrow')
+    batches = list(con.execute_batches(expr, chunksize=1000))
+    assert sum(batch.num_rows for batch in batches) == len(sorted_df)
+    assert batches[0].schema.names == list(sorted_df.columns)
+
+
+def test_query_cache_rebinds_params(backend, alltypes, df):
+    param = ibis.param('int32')
+    expr = alltypes[alltypes.int_col > param].count()
+    info = backend.query_cache_info()
+    for value in range(3):
+        expected = (df.int_col > value).sum()
+        assert backend.execute(expr, params={param: value}) == expected
+    after = backend.query_cache_info()
+    assert after.misses == info.misses + 1
+    assert after.hits == info.hits + 2
+
+    with pytest.raises(KeyError):
+        backend.execute(expr)
+
+
+def test_query_cache_default_limit(backend, alltypes):
+    expr = alltypes[['id']]
+    with ibis.config.option_context('sql.default_limit', 5):
+        assert len(backend.execute(expr)) == 5
+    with ibis.config.option_context('sql.default_limit', 7):
+        assert len(backend.execute(expr)) == 7
+
+
+def test_warm_metadata(backend):
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    con.warm_metadata()
+    assert 'functional_alltypes' in con.list_tables()
+    expected = backend.table('functional_alltypes').schema()
+    assert con.table('functional_alltypes').schema().equals(expected)
+
+    con.invalidate('functional_alltypes')
+    assert con.table('functional_alltypes').schema().equals(expected)
+
+
+def test_sql_schema_without_execution(backend):
+    query = (
+        'WITH t AS (SELECT id, double_col FROM functional_alltypes) '
+        'SELECT TOP 5 id, CAST(double_col AS DECIMAL(10, 2)) AS d, '
+        'CAST(NULL AS VARBINARY(8)) AS b, CAST(NULL AS DATE) AS dt '
+        'FROM t ORDER BY id'
+    )
+    expr = backend.sql(query)
+    assert expr.schema().names == ['id', 'd', 'b', 'dt']
+    assert expr.schema().types[1].equals(dt.Decimal(10, 2))
+
+
+def test_execute_async(backend, alltypes, df):
+    expr = alltypes.int_col.sum()
+
+    async def run():
+        return await asyncio.gather(
+            *(backend.execute_async(expr) for _ in range(4))
+        )
+
+    results = asyncio.get_event_loop().run_until_complete(run())
+    assert results == [df.int_col.sum()] * 4
+
+
+def test_execute_iter_async(backend, alltypes, sorted_df):
+    async def run():
+        expr = alltypes.sort_by('id')
+        return [
+            chunk
+            async for chunk in backend.execute_iter_async(expr, chunksize=1000)
+        ]
+
+    chunks = asyncio.get_event_loop().run_until_complete(run())
+    result = pd.concat(chunks, ignore_index=True)
+    tm.assert_frame_equal(result, sorted_df)
+
+
+@pytest.mark.parametrize('key', ['id', 'double_col', 'timestamp_col'])
+def test_execute_parallel(backend, alltypes, df, key):
+    result = backend.execute_parallel(alltypes, partition_by=key, n=4)
+    assert len(result) == len(df)
+    assert result.id.sort_values().tolist() == df.id.sort_values().tolist()
+
+
+def test_materialize(backend, alltypes, df):
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    t = con.table('functional_alltypes')
+    expr = t[t.int_col > 4].group_by('string_col').aggregate(n=t.id.count())
+    with con:
+        cached = con.materialize(expr)
+        name = cached.op().name
+        assert cached.n.sum().execute() == (df.int_col > 4).sum()
+        assert backend.sql('SELECT * FROM {}'.format(name)).count().execute()
+    with pytest.raises(Exception):
+        backend.raw_sql('SELECT * FROM {}'.format(name))
+
+
+def test_materialize_dropped_without_close(backend):
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    t = con.table('functional_alltypes')
+    name = con.materialize(t[['id']].limit(10)).op().name
+    assert backend.sql('SELECT * FROM {}'.format(name)).count().execute()
+
+    del con, t
+    gc.collect()
+    with pytest.raises(Exception):
+        backend.raw_sql('SELECT * FROM {}'.format(name))
+
+
+def test_hints(backend, df):
+    t = backend.table('functional_alltypes', hints=['NOLOCK'])
+    expr = t[t.int_col > 4]
+    sql = str(
+        backend.compile(expr, hints={'maxdop': 1, 'recompile': True}).compile(
+            dialect=backend.con.dialect
+        )
+    )
+    assert 'WITH (NOLOCK)' in sql
+    assert sql.endswith('OPTION (MAXDOP 1, RECOMPILE)')
+
+    result = backend.execute(expr.count(), hints={'maxdop': 1})
+    assert result == (df.int_col > 4).sum()
+
+    with pytest.raises(com.IbisInputError):
+        backend.compile(expr, hints={'no_such_hint': True})
+
+
+def test_limit_offset(alltypes, sorted_df):
+    result = alltypes.sort_by('id').limit(10, offset=20).execute()
+    expected = sorted_df.iloc[20:30].reset_index(drop=True)
+    tm.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize('key', ['id', ['string_col', 'id']])
+def test_paginate(backend, alltypes, df, key):
+    pages = list(backend.paginate(alltypes, key, page_size=1000))
+    assert all(len(page) == 1000 for page in pages[:-1])
+    result = pd.concat(pages, ignore_index=True)
+    expected = df.sort_values(key).reset_index(drop=True)
+    assert result.id.tolist() == expected.id.tolist()
+
+
+def test_paginate_datetime_key(backend, temp_table):
+    # DATETIME stores 1/300 s ticks, fetched rounded to milliseconds
+    backend.raw_sql('CREATE TABLE {} (ts DATETIME)'.format(temp_table))
+    backend.raw_sql(
+        "INSERT INTO {} VALUES ('2020-01-01 00:00:00.000'), "
+        "('2020-01-01 00:00:00.003'), ('2020-01-01 00:00:00.007'), "
+        "('2020-01-01 00:00:00.010')".format(temp_table)
+    )
+    t = backend.table(temp_table)
+    pages = list(backend.paginate(t, 'ts', page_size=1))
+    result = pd.concat(pages, ignore_index=True)
+    assert len(result) == 4
+    assert result.ts.is_unique
+
+
+def test_numpy_params(backend, alltypes, df):
+    param = ibis.param(dt.int32)
+    expr = alltypes[alltypes.int_col > param].count()
+    result = backend.execute(expr, params={param: np.int32(4)})
+    assert result == (df.int_col > 4).sum()
+
+
+def test_string_binds_match_varchar_columns(backend, temp_table):
+    backend.raw_sql(
+        'CREATE TABLE {} (k VARCHAR(10), u NVARCHAR(10))'.format(temp_table)
+    )
+    backend.raw_sql(
+        "INSERT INTO {} VALUES ('a', 'a'), ('b', 'b'), ('c', 'c')".format(
+            temp_table
+        )
+    )
+    t = backend.table(temp_table)
+    param = ibis.param(dt.string)
+    expr = t[(t.k == param) | t.k.isin(['b']) | (t.u == 'c')]
+    sql = str(
+        backend.compile(expr, params={param: 'a'}).compile(
+            dialect=backend.con.dialect
+        )
+    )
+    # only the binds compared with the VARCHAR column are cast
+    assert sql.count('AS VARCHAR(max))') == 2
+
+    result = backend.execute(expr.count(), params={param: 'a'})
+    assert result == 3
+
+
+@pytest.mark.parametrize('server_stats', [False, True])
+def test_query_listener(backend, alltypes, df, server_stats):
+    con = ibis_mssql.connect(
+        url=str(backend.con.url), server_stats=server_stats
+    )
+    records = []
+    con.add_query_listener(records.append)
+    try:
+        t = con.table('functional_alltypes')
+        result = con.execute(t[t.int_col > 4], limit=None)
+    finally:
+        con.remove_query_listener(records.append)
+
+    (stats,) = records
+    assert stats.rows == len(result) == (df.int_col > 4).sum()
+    assert stats.bytes > 0
+    assert stats.execute_time > 0
+    if server_stats:
+        assert stats.server_stats['logical_reads'] > 0
+    else:
+        assert stats.server_stats is None
+
+
+def test_explain(backend, alltypes):
+    expr = alltypes.group_by('string_col').aggregate(
+        total=alltypes.double_col.sum()
+    )
+    plan = backend.explain(expr, large_scan_rows=1)
+    assert plan.estimated_cost > 0
+    assert plan.root.physical_op
+    assert any(node.object for node in plan.walk())
+    assert 'scan' in {warning.kind for warning in plan.warnings}
+
+
+def test_result_cache(backend, temp_table, tmp_path):
+    backend.raw_sql('CREATE TABLE {} (id INT)'.format(temp_table))
+    backend.raw_sql('INSERT INTO {} VALUES (1), (2)'.format(temp_table))
+    con = ibis_mssql.connect(
+        url=str(backend.con.url), result_cache=str(tmp_path)
+    )
+    t = con.table(temp_table)
+
+    assert con.execute(t.id.sum(), cache=True) == 3
+    assert con.execute(t.id.sum(), cache=True) == 3
+    assert con.result_cache.hits == 1
+
+    backend.raw_sql('INSERT INTO {} VALUES (3)'.format(temp_table))
+    assert con.execute(t.id.sum(), cache=True) == 6
+    assert con.result_cache.hits == 1
+
+
+def test_result_cache_check_interval(backend, temp_table, tmp_path):
+    backend.raw_sql('CREATE TABLE {} (id INT)'.format(temp_table))
+    backend.raw_sql('INSERT INTO {} VALUES (1), (2)'.format(temp_table))
+    con = ibis_mssql.connect(
+        url=str(backend.con.url),
+        result_cache=str(tmp_path),
+        result_cache_check_interval=60,
+    )
+    assert con.result_cache.check_interval == 60
+
+    expr = con.table(temp_table).id.sum()
+    assert con.execute(expr, cache=True) == 3
+    lookups = []
+    con._table_versions = lookups.append
+    assert con.execute(expr, cache=True) == 3
+    assert not lookups
+    assert con.result_cache.hits == 1
+
+
+def test_memory_cache(backend, alltypes):
+    backend.memory_cache = MemoryResultCache()
+    try:
+        expr = alltypes[alltypes.int_col == 1].limit(10)
+        first = backend.execute(expr, cache=True)
+        second = backend.execute(expr, cache=60)
+        info = backend.result_cache_info()
+    finally:
+        backend.memory_cache = memory_cache
+
+    tm.assert_frame_equal(first, second)
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.currbytes > 0
+    with pytest.raises(ValueError):
+        second.iloc[0, 0] = 0
+
+
+@pytest.mark.parametrize('format', ['parquet', 'csv'])
+def test_export(backend, alltypes, df, tmp_path, format):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'alltypes.{}'.format(format))
+    expr = alltypes[['id', 'string_col', 'double_col']]
+    rows = backend.export(expr, path, format=format, row_group_size=1000)
+    assert rows == len(df)
+
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        assert parquet_file.metadata.row_group(0).num_rows == 1000
+        result = parquet_file.read().to_pandas()
+    else:
+        result = pd.read_csv(path)
+    expected = df[['id', 'string_col', 'double_col']]
+    tm.assert_frame_equal(
+        result.sort_values('id').reset_index(drop=True),
+        expected.sort_values('id').reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_upsert(backend, temp_table):
+    backend.raw_sql(
+        'CREATE TABLE {} (id INT PRIMARY KEY, name NVARCHAR(10))'.format(
+            temp_table
+        )
+    )
+    backend.raw_sql(
+        "INSERT INTO {} VALUES (1, 'a'), (2, 'b')".format(temp_table)
+    )
+
+    source = pd.DataFrame({'id': [2, 3], 'name': ['B', 'c']})
+    counts = backend.upsert(temp_table, source, keys=['id'])
+    assert (counts.inserted, counts.updated) == (1, 1)
+
+    t = backend.table(temp_table)
+    renamed = t[t.id == 1][t.id, ibis.literal('A').name('name')]
+    counts = backend.upsert(temp_table, renamed, keys='id')
+    assert (counts.inserted, counts.updated) == (0, 1)
+
+    result = t.sort_by('id').execute()
+    assert result.name.tolist() == ['A', 'B', 'c']
+
+
+def test_upsert_sorted_and_cte_sources(backend, temp_table):
+    backend.raw_sql(
+        'CREATE TABLE {} (id INT PRIMARY KEY, name NVARCHAR(10))'.format(
+            temp_table
+        )
+    )
+    backend.raw_sql(
+        "INSERT INTO {} VALUES (1, 'a'), (2, 'b')".format(temp_table)
+    )
+    t = backend.table(temp_table)
+
+    sorted_source = t.mutate(name=t.name.upper()).sort_by(ibis.desc('id'))
+    counts = backend.upsert(temp_table, sorted_source, keys='id')
+    assert (counts.inserted, counts.updated) == (0, 2)
+
+    # the aggregate is referenced twice, so it compiles to a CTE
+    sizes = t.group_by('id').aggregate(n=t.count())
+    other = sizes.view()
+    cte_source = sizes.join(other, sizes.id == other.id)[
+        (sizes.id + 10).name('id'), ibis.literal('c').name('name')
+    ]
+    counts = backend.upsert(temp_table, cte_source, keys='id')
+    assert (counts.inserted, counts.updated) == (2, 0)
+
+    result = t.sort_by('id').execute()
+    assert result.id.tolist() == [1, 2, 11, 12]
+    assert result.name.tolist() == ['A', 'B', 'c', 'c']
+
+
+def test_first_query_latency(backend):
+    start = time.perf_counter()
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    assert con._inspector is None
+    assert con.execute(ibis.literal(1)) == 1
+    assert time.perf_counter() - start < 5
+
+
+def test_warm_metadata_rowversion(backend, temp_table):
+    backend.raw_sql(
+        'CREATE TABLE {} (id INT, version ROWVERSION)'.format(temp_table)
+    )
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    con.warm_metadata()
+    assert con.table(temp_table).columns == ['id', 'version']
+
+
+def test_list_tables_after_invalidate(backend, temp_table):
+    con = ibis_mssql.connect(url=str(backend.con.url))
+    assert temp_table not in con.list_tables()
+    backend.raw_sql('CREATE TABLE {} (id INT)'.format(temp_table))
+    con.invalidate(temp_table)
+    assert temp_table in con.list_tables()
@@ -0,0 +1,311 @@
+import pytest
+import sqlalchemy as sa
+import sqlalchemy.dialects.mssql as mssql
+
+import ibis
+import ibis.common.exceptions as com
+
+import ibis_mssql
+from ibis_mssql.compiler import (
+    MSSQLDialect,
+    _regex_to_like,
+    param_key,
+    to_sqlalchemy,
+)
+
+
+@pytest.fixture(scope='module')
+def table():
+    return ibis.table(
+        [
+            ('id', 'int64'),
+            ('key', 'string'),
+            ('ts', 'timestamp'),
+            ('value', 'double'),
+        ],
+        name='t',
+    )
+
+
+def to_sql(expr, params=None, server_version=None):
+    if server_version is None:
+        query = ibis_mssql.compile(expr, params=params)
+    else:
+        dialect = MSSQLDialect.for_server_version(server_version)
+        query = to_sqlalchemy(expr, dialect.make_context(params=params))
+    compiled = query.compile(
+        dialect=mssql.dialect(), compile_kwargs={'literal_binds': True}
+    )
+    return ' '.join(str(compiled).split())
+
+
+def test_cumulative_sum(table):
+    window = ibis.cumulative_window(order_by=table.ts, group_by=table.key)
+    expr = table.mutate(total=table.value.sum().over(window))
+    assert (
+        'sum(t0.value) OVER (PARTITION BY t0.[key] ORDER BY t0.ts ASC '
+        'ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS total'
+    ) in to_sql(expr)
+
+
+def test_row_number_without_order_by(table):
+    expr = table.mutate(rn=ibis.row_number())
+    assert 'row_number() OVER (ORDER BY (SELECT NULL)) - 1 AS rn' in to_sql(
+        expr
+    )
+
+
+def test_lag_with_default(table):
+    window = ibis.window(order_by=table.ts)
+    expr = table.mutate(prev=table.value.lag(2, 0).over(window))
+    assert 'lag(t0.value, 2, 0) OVER (ORDER BY t0.ts ASC) AS prev' in to_sql(
+        expr
+    )
+
+
+def test_bounded_rows_window(table):
+    window = ibis.trailing_window(2, order_by=table.ts)
+    expr = table.mutate(total=table.value.sum().over(window))
+    # without literal_binds: T-SQL doesn't accept parameters as offsets
+    compiled = ibis_mssql.compile(expr).compile(dialect=mssql.dialect())
+    assert (
+        'sum(t0.value) OVER (ORDER BY t0.ts ASC '
+        'ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) AS total'
+    ) in ' '.join(str(compiled).split())
+
+    window = ibis.window(preceding=1, following=3, order_by=table.ts)
+    expr = table.mutate(total=table.value.sum().over(window))
+    assert 'ROWS BETWEEN 1 PRECEDING AND 3 FOLLOWING' in to_sql(expr)
+
+
+def test_bounded_range_window(table):
+    window = ibis.range_window(preceding=2, following=0, order_by=table.id)
+    expr = table.mutate(total=table.value.sum().over(window))
+    with pytest.raises(com.UnsupportedOperationError):
+        to_sql(expr)
+
+
+def test_unbounded_range_window(table):
+    window = ibis.range_window(preceding=None, following=0, order_by=table.id)
+    expr = table.mutate(total=table.value.sum().over(window))
+    assert (
+        'sum(t0.value) OVER (ORDER BY t0.id ASC '
+        'RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS total'
+    ) in to_sql(expr)
+
+
+def test_unordered_window_has_no_frame(table):
+    expr = table.mutate(
+        total=table.value.sum().over(ibis.window(group_by=table.key))
+    )
+    assert 'sum(t0.value) OVER (PARTITION BY t0.[key]) AS total' in to_sql(
+        expr
+    )
+
+
+@pytest.mark.parametrize(
+    ('unit', 'expected'),
+    [
+        (
+            'D',
+            "dateadd(day, datediff(day, CAST('1900-01-01' AS DATETIME2), "
+            "t0.ts), CAST('1900-01-01' AS DATETIME2))",
+        ),
+        (
+            'h',
+            'dateadd(hour, datediff(hour, CAST(CAST(t0.ts AS DATE) '
+            'AS DATETIME2), t0.ts), CAST(CAST(t0.ts AS DATE) AS DATETIME2))',
+        ),
+    ],
+)
+def test_timestamp_truncate(table, unit, expected):
+    expr = table.ts.truncate(unit).name('tmp')
+    assert '{} AS tmp'.format(expected) in to_sql(expr)
+
+
+def test_timestamp_truncate_datetrunc(table):
+    expr = table.ts.truncate('W').name('tmp')
+    sql = to_sql(expr, server_version=(16, 0, 1000))
+    assert 'datetrunc(iso_week, t0.ts) AS tmp' in sql
+
+
+@pytest.mark.parametrize(
+    ('pattern', 'expected'),
+    [
+        ('^ab.*', 'ab%'),
+        (r'\d+', None),
+        (r'^\d\d-[a-c]$', '[0-9][0-9]-[a-c]'),
+        ('50%', '%50[%]%'),
+        ('a|b', None),
+    ],
+)
+def test_regex_to_like(pattern, expected):
+    assert _regex_to_like(pattern) == expected
+
+
+def test_string_predicates(table):
+    expr = table[
+        table.key.like('a%')
+        & table.key.re_search('^b.c')
+        & ~table.key.isin(['x'])
+    ]
+    sql = to_sql(expr)
+    assert "t0.[key] LIKE N'a%'" in sql
+    assert "t0.[key] LIKE 'b_c%'" in sql
+    assert "t0.[key] NOT IN (N'x')" in sql
+
+
+def test_regex_search_unsupported(table):
+    expr = table[table.key.re_search('a|b')]
+    with pytest.raises(com.UnsupportedOperationError):
+        to_sql(expr)
+
+
+def test_numeric_functions(table):
+    expr = table.projection(
+        [
+            table.value.round().name('rounded'),
+            table.value.log(2).name('log'),
+            (table.id % 3).name('mod_int'),
+            (table.value % 2).name('mod_float'),
+            table.id.nullif(0).name('nulled'),
+        ]
+    )
+    sql = to_sql(expr)
+    assert 'CAST(round(t0.value, 0) AS BIGINT) AS rounded' in sql
+    assert 'log(t0.value, 2) AS log' in sql
+    assert 't0.id % 3 AS mod_int' in sql
+    assert 't0.value - 2 * round(t0.value / 2, 0, 1) AS mod_float' in sql
+    assert 'nullif(t0.id, 0) AS nulled' in sql
+
+
+@pytest.mark.parametrize(
+    ('server_version', 'expected'),
+    [
+        (
+            (15, 0, 2000),
+            'CASE WHEN (t0.id IS NOT NULL AND (t0.id >= 0 OR 0 IS NULL)) '
+            'THEN t0.id '
+            'WHEN (0 IS NOT NULL AND (0 >= t0.id OR t0.id IS NULL)) '
+            'THEN 0 ELSE NULL END',
+        ),
+        ((16, 0, 1000), 'greatest(t0.id, 0)'),
+    ],
+)
+def test_greatest(table, server_version, expected):
+    expr = ibis.greatest(table.id, 0).name('tmp')
+    sql = to_sql(expr, server_version=server_version)
+    assert '{} AS tmp'.format(expected) in sql
+
+
+def test_greatest_rebinds_params(table):
+    param = ibis.param('int64')
+    expr = table.mutate(g=ibis.greatest(table.id, param))
+    dialect = MSSQLDialect.for_server_version((15, 0, 2000))
+    query = to_sqlalchemy(expr, dialect.make_context(params={param: 3}))
+    query = query.params({param_key(param.op()): 5})
+    compiled = query.compile(
+        dialect=mssql.dialect(), compile_kwargs={'literal_binds': True}
+    )
+    assert '>= 5' in str(compiled)
+    assert '>= 3' not in str(compiled)
+
+
+def test_greatest_in_aggregate(table):
+    expr = ibis.greatest(table.id, table.value).sum().name('tmp')
+    sql = to_sql(expr, server_version=(15, 0, 2000))
+    assert sql.startswith('SELECT sum(CASE WHEN')
+    assert 'VALUES' not in sql
+
+
+def test_count(table):
+    expr = table.group_by('key').aggregate(
+        n=table.count(), distinct=table.id.nunique()
+    )
+    sql = to_sql(expr)
+    assert 'count(*) AS n' in sql
+    assert 'count(DISTINCT t0.id) AS [distinct]' in sql
+
+
+@pytest.mark.parametrize(
+    ('server_version', 'expected'),
+    [
+        ((14, 0, 1000), 'count(DISTINCT t0.id)'),
+        ((15, 0, 2000), 'approx_count_distinct(t0.id)'),
+    ],
+)
+def test_approx_nunique(table, server_version, expected):
+    expr = table.id.approx_nunique().name('tmp')
+    sql = to_sql(expr, server_version=server_version)
+    assert '{} AS tmp'.format(expected) in sql
+
+
+def test_approx_median(table):
+    expr = table.value.approx_median().name('tmp')
+    sql = to_sql(expr, server_version=(16, 0, 1000))
+    assert (
+        'approx_percentile_cont(0.5) WITHIN GROUP (ORDER BY t0.value) AS tmp'
+    ) in sql
+
+
+def test_quantile_over_window(table):
+    window = ibis.window(group_by=table.key)
+    expr = table.mutate(p90=table.value.quantile(0.9).over(window))
+    assert (
+        'percentile_cont(0.9) WITHIN GROUP (ORDER BY t0.value) '
+        'OVER (PARTITION BY t0.[key]) AS p90'
+    ) in to_sql(expr)
+
+
+def test_limit_offset(table):
+    expr = table.sort_by('id').limit(10, offset=20)
+    assert to_sql(expr).endswith(
+        'ORDER BY t0.id OFFSET 20 ROWS FETCH NEXT 10 ROWS ONLY'
+    )
+
+
+def test_limit_offset_unordered(table):
+    expr = table.limit(10, offset=20)
+    assert to_sql(expr).endswith(
+        'ORDER BY (SELECT NULL) OFFSET 20 ROWS FETCH NEXT 10 ROWS ONLY'
+    )
+
+
+def test_limit_offset_subquery(table):
+    limited = table.sort_by(ibis.desc(table.value)).limit(5, offset=5)
+    expr = limited.group_by('key').aggregate(total=limited.value.sum())
+    assert (
+        'ORDER BY t1.value DESC OFFSET 5 ROWS FETCH NEXT 5 ROWS ONLY'
+    ) in to_sql(expr)
+
+
+def test_cast_double(table):
+    expr = table.id.cast('double').name('tmp')
+    assert 'CAST(t0.id AS FLOAT(53)) AS tmp' in to_sql(expr)
+
+
+def test_cast_like_datetime_column():
+    from ibis_mssql.client import MSSQLTable
+    from ibis_mssql.compiler import CastLikeColumn
+
+    # no connection is opened
+    con = ibis_mssql.connect(host='ibis-mssql.invalid', user='u')
+    sa_table = sa.Table(
+        't',
+        sa.MetaData(),
+        sa.Column('ts', sa.DATETIME),
+        sa.Column('ts2', mssql.DATETIME2),
+    )
+    t = MSSQLTable(sa_table, con).to_expr()
+    param = ibis.param('timestamp')
+    expr = t[
+        (t.ts > CastLikeColumn(param, t.ts).to_expr())
+        & (t.ts2 > CastLikeColumn(param, t.ts2).to_expr())
+    ]
+    sql = to_sql(
+        expr, params={param: '2020-01-01 00:00:00.003'}, server_version=(15,)
+    )
+    assert (
+        "WHERE t0.ts > CAST(N'2020-01-01 00:00:00.003' AS DATETIME) "
+        "AND t0.ts2 > N'2020-01-01 00:00:00.003'"
+    ) in sql
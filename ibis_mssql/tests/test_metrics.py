@@ -0,0 +1,48 @@
+from ibis_mssql.metrics import QueryMetrics, QueryStats, parse_statistics
+
+
+def make_stats(**kwargs):
+    values = dict(
+        sql_hash='abc',
+        sql='SELECT 1',
+        compile_time=0.5,
+        execute_time=0.25,
+        fetch_time=0.25,
+        rows=10,
+        bytes=80,
+        server_stats=None,
+    )
+    values.update(kwargs)
+    return QueryStats(**values)
+
+
+def test_parse_statistics():
+    messages = [
+        "Table 'functional_alltypes'. Scan count 1, logical reads 12, "
+        'physical reads 1, read-ahead reads 0',
+        'SQL Server parse and compile time: CPU time = 3 ms, '
+        'elapsed time = 3 ms.',
+        'SQL Server Execution Times: CPU time = 15 ms,  elapsed time = 20 ms.',
+    ]
+    assert parse_statistics(messages) == {
+        'logical_reads': 12,
+        'physical_reads': 1,
+        'cpu_time_ms': 15,
+        'elapsed_time_ms': 20,
+    }
+
+
+def test_query_metrics():
+    metrics = QueryMetrics(maxlen=1)
+    metrics(make_stats())
+    metrics(make_stats(server_stats={'logical_reads': 7, 'cpu_time_ms': 2}))
+
+    assert len(metrics.records()) == 1
+    totals = metrics.totals()['abc']
+    assert totals['queries'] == 2
+    assert totals['rows'] == 20
+    assert totals['logical_reads'] == 7
+
+    text = metrics.to_prometheus()
+    assert '# TYPE ibis_mssql_rows_total counter' in text
+    assert 'ibis_mssql_queries_total{sql_hash="abc"} 2' in text
@@ -0,0 +1,101 @@
+import pytest
+
+from ibis_mssql.plan import parse_showplan
+
+SHOWPLAN = """\
+<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan"
+             Version="1.564" Build="16.0.1000.6">
+  <BatchSequence>
+    <Batch>
+      <Statements>
+        <StmtSimple StatementText="SELECT ..." StatementId="1"
+                    StatementSubTreeCost="12.5" StatementEstRows="10"
+                    StatementType="SELECT">
+          <QueryPlan DegreeOfParallelism="4">
+            <MissingIndexes>
+              <MissingIndexGroup Impact="87.5">
+                <MissingIndex Database="[ibis_testing]" Schema="[dbo]"
+                              Table="[functional_alltypes]">
+                  <ColumnGroup Usage="EQUALITY">
+                    <Column Name="[string_col]" ColumnId="10" />
+                  </ColumnGroup>
+                  <ColumnGroup Usage="INCLUDE">
+                    <Column Name="[double_col]" ColumnId="9" />
+                  </ColumnGroup>
+                </MissingIndex>
+              </MissingIndexGroup>
+            </MissingIndexes>
+            <Warnings>
+              <PlanAffectingConvert ConvertIssue="Seek Plan"
+                  Expression="CONVERT_IMPLICIT(nvarchar(max),[t0].[key],0)" />
+            </Warnings>
+            <RelOp NodeId="0" PhysicalOp="Hash Match" LogicalOp="Aggregate"
+                   EstimateRows="10" EstimatedTotalSubtreeCost="12.5"
+                   Parallel="1">
+              <Warnings>
+                <SpillToTempDb SpillLevel="1" />
+              </Warnings>
+              <Hash>
+                <RelOp NodeId="1" PhysicalOp="Table Scan"
+                       LogicalOp="Table Scan" EstimateRows="5000"
+                       EstimatedRowsRead="250000" TableCardinality="250000"
+                       EstimatedTotalSubtreeCost="11.2" Parallel="1">
+                  <TableScan Ordered="0">
+                    <Object Database="[ibis_testing]" Schema="[dbo]"
+                            Table="[functional_alltypes]" />
+                  </TableScan>
+                </RelOp>
+              </Hash>
+            </RelOp>
+          </QueryPlan>
+        </StmtSimple>
+      </Statements>
+    </Batch>
+  </BatchSequence>
+</ShowPlanXML>
+"""
+
+
+def test_parse_showplan_tree():
+    plan = parse_showplan(SHOWPLAN)
+    assert plan.estimated_cost == 12.5
+    assert plan.estimated_rows == 10
+    assert plan.degree_of_parallelism == 4
+
+    root = plan.root
+    assert (root.physical_op, root.logical_op) == ('Hash Match', 'Aggregate')
+    assert root.parallel
+
+    (scan,) = root.children
+    assert scan.physical_op == 'Table Scan'
+    assert scan.estimated_rows == 5000
+    assert scan.object == '[ibis_testing].[dbo].[functional_alltypes]'
+    assert [node.node_id for node in plan.walk()] == [0, 1]
+
+
+def test_parse_showplan_warnings():
+    plan = parse_showplan(SHOWPLAN)
+    kinds = {(warning.kind, warning.node_id) for warning in plan.warnings}
+    assert kinds == {
+        ('missing_index', None),
+        ('implicit_conversion', None),
+        ('spill', 0),
+        ('scan', 1),
+    }
+    (missing,) = [w for w in plan.warnings if w.kind == 'missing_index']
+    assert 'EQUALITY: [string_col]' in missing.message
+    assert '87.5%' in missing.message
+
+
+def test_parse_showplan_scan_threshold():
+    plan = parse_showplan(SHOWPLAN, large_scan_rows=1000000)
+    assert 'scan' not in {warning.kind for warning in plan.warnings}
+
+
+def test_parse_showplan_without_plan():
+    xml = (
+        '<ShowPlanXML xmlns='
+        '"http://schemas.microsoft.com/sqlserver/2004/07/showplan" />'
+    )
+    with pytest.raises(ValueError):
+        parse_showplan(xml)
@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+
+# seconds, measured inside a fresh interpreter
+IMPORT_BUDGET = 0.05
+CONNECT_BUDGET = 0.1
+
+
+def run(code):
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+def test_import_is_lazy():
+    result = run(
+        'import json, sys, time\n'
+        'start = time.perf_counter()\n'
+        'import ibis_mssql\n'
+        'elapsed = time.perf_counter() - start\n'
+        "modules = [m for m in ('ibis', 'sqlalchemy', 'pyodbc') "
+        'if m in sys.modules]\n'
+        'print(json.dumps([elapsed, modules]))\n'
+    )
+    elapsed, modules = result
+    assert modules == []
+    assert elapsed < IMPORT_BUDGET
+
+
+def test_connect_is_lazy():
+    # an unresolvable host fails on the first query, not in connect
+    result = run(
+        'import json, time\n'
+        'import ibis_mssql.api\n'
+        'start = time.perf_counter()\n'
+        "con = ibis_mssql.connect(host='ibis-mssql.invalid', user='u')\n"
+        'elapsed = time.perf_counter() - start\n'
+        'print(json.dumps([elapsed, con.con.pool.checkedin()]))\n'
+    )
+    elapsed, pooled_connections = result
+    assert pooled_connections == 0
+    assert elapsed < CONNECT_BUDGET
@@ -30,6 +30,7 @@ setup(
     packages=find_packages(),
     install_requires=["ibis-framework", "sqlalchemy", "pyodbc"],
     extras_require={
+        'arrow': ['pyarrow'],
         'develop': [
             'black',
             'click',